@@ -1,10 +1,11 @@
-import json
 import re
 from datetime import datetime
 import argparse
 
 from config import PATTERNS
+from extraction_result import ExtractionResult
 from utils import format_date, extract_clause
+from processors.large_text_processor import is_large_text_file, process_large_text_file
 
 def extract_information(text):
     """
@@ -32,14 +33,14 @@ def extract_information(text):
     for clause in re.finditer(PATTERNS["risky_clauses"], text, re.IGNORECASE):
         risky_clauses.append(clause.group(0).strip())
 
-    return {
-        "parties": cleaned_parties if cleaned_parties else None,
-        "effective_date": effective_date,
-        "termination_clause": termination_clause,
-        "payment_terms": payment_terms,
-        "confidentiality_obligations": confidentiality_obligations,
-        "risky_clauses": risky_clauses if risky_clauses else None
-    }
+    return ExtractionResult(
+        parties=cleaned_parties if cleaned_parties else None,
+        effective_date=effective_date,
+        termination_clause=termination_clause,
+        payment_terms=payment_terms,
+        confidentiality_obligations=confidentiality_obligations,
+        risky_clauses=risky_clauses if risky_clauses else None
+    )
 
 def main():
     """
@@ -50,12 +51,16 @@ def main():
     args = parser.parse_args()
 
     try:
-        with open(args.file_path, 'r') as f:
-            agreement_text = f.read()
+        if is_large_text_file(args.file_path):
+            # Very large plain-text files are scanned in chunks instead of being read into memory
+            extracted_data = process_large_text_file(args.file_path)
+        else:
+            with open(args.file_path, 'r') as f:
+                agreement_text = f.read()
+            
+            extracted_data = extract_information(agreement_text)
         
-        extracted_data = extract_information(agreement_text)
-        
-        print(json.dumps(extracted_data, indent=2))
+        print(extracted_data.to_json())
 
     except FileNotFoundError:
         print(f"Error: File not found at {args.file_path}")
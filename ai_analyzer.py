@@ -1,22 +1,13 @@
-import os
 import json
 
-try:
-    import google.generativeai as genai
-except ImportError:
-    genai = None
+from json_stream import IncrementalJSONParser
+from extraction_result import ExtractionResult, FIELD_NAMES, LIST_FIELDS
+from llm_backend import get_backend
 
-def analyze_text_with_llm(text, api_key):
+def build_prompt(text):
     """
-    Analyzes text using the Gemini LLM to extract structured information and token usage.
+    Builds the extraction prompt for the given agreement text.
     """
-    if not genai:
-        raise ImportError("google-generativeai is not installed. Please install it with 'pip install google-generativeai'")
-
-    genai.configure(api_key= "Replace with your actual api")
-
-    model = genai.GenerativeModel('gemini-1.5-flash')
-
     # --- MODIFICATION: Updated prompt to include vendor and receiver ---
     # --- MODIFICATION: Enhanced prompt for risky_clauses to be more specific and include examples ---
     # --- MODIFICATION: Added instruction for LLM to explain why a clause is risky ---
@@ -60,43 +51,22 @@ def analyze_text_with_llm(text, api_key):
     {text}
     """
 
-    response = model.generate_content(prompt)
-
-    # Capture token usage
-    token_usage = {
-        "input_tokens": response.usage_metadata.prompt_token_count,
-        "output_tokens": response.usage_metadata.candidates_token_count,
-        "total_tokens": response.usage_metadata.total_token_count
-    }
-
-    # The response from Gemini might need to be cleaned up to be valid JSON
-    cleaned_text = response.text.strip().replace('```json', '').replace('```', '').strip()
-    
-    extracted_data = {}
-    try:
-        extracted_data = json.loads(cleaned_text)
-    except (json.JSONDecodeError, AttributeError):
-        # If JSON parsing fails, try to extract specific fields if possible, or return error
-        # For now, we'll return an error and the raw response.
-        # A more robust solution might involve more sophisticated error handling or regex extraction.
-        return {"error": "Failed to parse LLM response", "raw_response": response.text if hasattr(response, 'text') else str(response)}
+    return prompt
 
+def normalize_extracted_data(extracted_data):
+    """
+    Ensures all expected fields are present, with list fields as lists and the rest as strings or null.
+    """
     # --- MODIFICATION: Post-process to ensure all expected fields are lists or null ---
-    expected_fields = [
-        "parties", "effective_date", "termination_clause", 
-        "payment_terms", "confidentiality_obligations", 
-        "risky_clauses", "vendor", "receiver"
-    ]
-
-    for field in expected_fields:
+    for field in FIELD_NAMES:
         if field not in extracted_data or extracted_data[field] is None:
-            if field in ["parties", "risky_clauses"]:
+            if field in LIST_FIELDS:
                 extracted_data[field] = [] # Default to empty list for these fields
             else:
                 extracted_data[field] = None # Default to null for others
         else:
             # Ensure specific fields are lists
-            if field in ["parties", "risky_clauses"]:
+            if field in LIST_FIELDS:
                 if isinstance(extracted_data[field], str):
                     try:
                         # Try to parse if it's a string representation of a list
@@ -113,7 +83,73 @@ def analyze_text_with_llm(text, api_key):
             elif not isinstance(extracted_data[field], str) and extracted_data[field] is not None:
                  extracted_data[field] = str(extracted_data[field])
 
-    return {
-        "text": json.dumps(extracted_data, indent=2)
-    }
+    return extracted_data
 
+def analyze_text_with_llm(text, api_key, backend=None):
+    """
+    Analyzes text using the LLM to extract structured information and token usage.
+    Uses the backend selected by llm_backend.get_backend unless one is given.
+    Returns an ExtractionResult; if the response cannot be parsed, its error and raw_response are set.
+    """
+    backend = backend or get_backend(api_key)
+
+    prompt = build_prompt(text)
+
+    response_text, token_usage = backend.generate(prompt)
+
+    # The response from Gemini might need to be cleaned up to be valid JSON
+    cleaned_text = response_text.strip().replace('```json', '').replace('```', '').strip()
+    
+    extracted_data = {}
+    try:
+        extracted_data = json.loads(cleaned_text)
+    except (json.JSONDecodeError, AttributeError):
+        # If JSON parsing fails, try to extract specific fields if possible, or return error
+        # For now, we'll return an error and the raw response.
+        # A more robust solution might involve more sophisticated error handling or regex extraction.
+        return ExtractionResult(
+            error="Failed to parse LLM response",
+            raw_response=response_text,
+            token_usage=token_usage
+        )
+
+    result = ExtractionResult.from_dict(normalize_extracted_data(extracted_data))
+    result.token_usage = token_usage
+    return result
+
+
+def stream_analyze_text_with_llm(text, api_key, backend=None):
+    """
+    Streams the LLM analysis of the text, yielding each extracted field as soon as it is complete.
+
+    Yields ("item", field, value) for every risky clause, ("field", field, value) for every
+    top-level field and finally ("done", None, result), where result is an ExtractionResult as
+    returned by analyze_text_with_llm. Stop iterating to cancel the request.
+    """
+    backend = backend or get_backend(api_key)
+
+    response = backend.generate_stream(build_prompt(text))
+
+    parser = IncrementalJSONParser(item_fields=("risky_clauses", "parties"))
+    raw_text = ""
+    for chunk in response:
+        raw_text += chunk
+        for event in parser.feed(chunk):
+            yield event
+
+    token_usage = response.token_usage
+
+    if not parser.done:
+        # Fall back to parsing the full response, as analyze_text_with_llm does
+        cleaned_text = raw_text.strip().replace('```json', '').replace('```', '').strip()
+        try:
+            extracted_data = json.loads(cleaned_text)
+        except json.JSONDecodeError:
+            yield ("done", None, ExtractionResult(error="Failed to parse LLM response", raw_response=raw_text, token_usage=token_usage))
+            return
+    else:
+        extracted_data = parser.fields
+
+    result = ExtractionResult.from_dict(normalize_extracted_data(extracted_data))
+    result.token_usage = token_usage
+    yield ("done", None, result)
@@ -1,25 +1,92 @@
 import streamlit as st
 import os
 import sys
+import time
+import uuid
 print(sys.executable)
 import json
 import pandas as pd
 from datetime import datetime
-from main import get_file_processor
-import google.generativeai as genai # Import for token counting
-from ai_analyzer import analyze_text_with_llm
+from main import get_file_processor, analyze_document
+from llm_backend import get_backend, get_backend_name
+from ai_analyzer import analyze_text_with_llm, stream_analyze_text_with_llm
 from processors.image_processor import process_image
+from processors.pdf_processor import process_pdf_with_report
+from extraction_result import FIELD_NAMES, DISPLAY_NAMES, format_value, results_to_json, results_to_csv, results_to_xlsx
+from search_index import SearchIndex, SEARCH_INDEX_FILE
+from entity_index import EntityIndex, ENTITY_INDEX_FILE
+from job_queue import AnalysisQueue
+from utils import document_key
+from config import ANALYSIS_MAX_WORKERS
+from concurrent.futures import ThreadPoolExecutor
 import io
 
 # --- Constants ---
 USER_DATA_FILE = "user_data.json"
-# Configure genai for token counting
-if "GEMINI_API_KEY" in st.secrets:
-    genai.configure(api_key=st.secrets["GEMINI_API_KEY"])
-else:
-    st.warning("Gemini API key not found in .streamlit/secrets.toml. Token counting may not work.")
+# Only the Gemini backend needs an API key; LLM_BACKEND=fake runs offline
+if get_backend_name() == "gemini" and "GEMINI_API_KEY" not in st.secrets:
+    st.warning("Gemini API key not found in .streamlit/secrets.toml. Analysis and token counting will not work.")
 
 # --- Helper Functions ---
+@st.cache_resource
+def get_search_index():
+    """Opens the search index over processed agreements once per server process."""
+    return SearchIndex(SEARCH_INDEX_FILE)
+
+@st.cache_resource
+def get_entity_index():
+    """Opens the party index over processed agreements once per server process."""
+    return EntityIndex(ENTITY_INDEX_FILE)
+
+@st.cache_resource
+def get_analysis_executor():
+    """Creates the worker threads shared by the analysis queues of all sessions once per server process."""
+    return ThreadPoolExecutor(max_workers=ANALYSIS_MAX_WORKERS, thread_name_prefix="analysis")
+
+def document_token_usage(document_text, output_tokens, api_key):
+    """Token usage of one analysis, counting the document text (not the prompt template) as input."""
+    input_tokens = get_backend(api_key).count_tokens(document_text)
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens
+    }
+
+def analyze_uploaded_file(file_path, api_key, tesseract_cmd):
+    """Analyzes a saved upload in a background worker and deletes it afterwards."""
+    try:
+        document_text, result = analyze_document(file_path, api_key, tesseract_cmd=tesseract_cmd)
+        # Logged the same way as a single upload
+        result.token_usage = document_token_usage(document_text, result.token_usage["output_tokens"], api_key)
+        return document_text, result
+    finally:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+def get_analysis_queue():
+    """Returns the background analysis queue of the current session, creating it on first use."""
+    if "analysis_queue" not in st.session_state:
+        api_key = st.secrets.get("GEMINI_API_KEY")
+        tesseract_cmd = st.secrets.get("TESSERACT_CMD_PATH", None)
+        if tesseract_cmd == "your_tesseract_path_here":
+            tesseract_cmd = None
+        st.session_state.analysis_queue = AnalysisQueue(
+            lambda file_path: analyze_uploaded_file(file_path, api_key, tesseract_cmd),
+            executor=get_analysis_executor()
+        )
+    return st.session_state.analysis_queue
+
+def record_finished_jobs(jobs):
+    """Logs the tokens of newly finished jobs under the user who submitted them and indexes their results."""
+    # Token logs and the indexes are only written from the script thread, never from workers
+    for job in jobs:
+        if job.done and not job.logged:
+            if job.status == "done":
+                add_token_log(job.username, job.filename, job.result.token_usage)
+                get_search_index().add_document(job.filename, job.document_text, job.result.to_dict(), source="llm")
+                get_entity_index().add_document(job.filename, job.result.to_dict(), key=document_key(job.document_text))
+            job.logged = True
+
 def load_user_data():
     """Loads user data from the JSON file."""
     if os.path.exists(USER_DATA_FILE):
@@ -128,10 +195,12 @@ if "username" not in st.session_state:
     st.session_state.username = None
 if "current_document_text" not in st.session_state: # Store document text
     st.session_state.current_document_text = ""
-if "current_extracted_data_markdown" not in st.session_state: # Store extracted data as Markdown
-    st.session_state.current_extracted_data_markdown = ""
+if "current_extraction" not in st.session_state: # Store the ExtractionResult of the current file
+    st.session_state.current_extraction = None
 if "current_token_usage" not in st.session_state: # Store current file token usage
     st.session_state.current_token_usage = None
+if "current_pdf_report" not in st.session_state: # Store per-page PDF extraction report
+    st.session_state.current_pdf_report = None
 
 # --- Login Page ---
 if not st.session_state.logged_in:
@@ -148,7 +217,7 @@ if not st.session_state.logged_in:
                 st.session_state.username = username
                 st.session_state.current_token_usage = None # Reset token usage on new login
                 st.session_state.current_document_text = "" # Clear previous document
-                st.session_state.current_extracted_data_markdown = ""
+                st.session_state.current_extraction = None
                 st.rerun() # Rerun to show the main app
             else:
                 st.error("Invalid username or password")
@@ -224,17 +293,89 @@ else:
 
     # Logout button
     if st.sidebar.button("Logout"):
+        # Stop this user's batch: queued files are dropped, finished ones are still logged
+        analysis_queue = st.session_state.pop("analysis_queue", None)
+        if analysis_queue:
+            analysis_queue.shutdown()
+            record_finished_jobs(analysis_queue.snapshot())
+            for job in analysis_queue.snapshot():
+                if job.error == "Cancelled" and os.path.exists(job.file_path):
+                    os.remove(job.file_path)
         st.session_state.logged_in = False
         st.session_state.username = None
         st.session_state.current_token_usage = None # Clear token usage on logout
         st.session_state.current_document_text = "" # Clear previous document
-        st.session_state.current_extracted_data_markdown = ""
+        st.session_state.current_extraction = None
         st.rerun()
 
-    # --- File Upload and Analysis ---
-    uploaded_file = st.file_uploader("Upload an agreement file", type=["pdf", "docx", "txt", "png", "jpg", "jpeg"])
+    # --- Search Across Processed Agreements ---
+    with st.expander("Search Processed Agreements"):
+        st.caption('Words must all match; use quotes for phrases and a field prefix to search one extracted field, '
+                   'e.g. risky_clauses:"unlimited indemnification" or "payment due within 90 days".')
+        search_query = st.text_input("Search query")
+        if search_query:
+            search_index = get_search_index()
+            results = search_index.search(search_query, limit=50)
+            if results:
+                rows = []
+                for result in results:
+                    field, section = result["matches"][0]
+                    rows.append([
+                        result["document"],
+                        result["score"],
+                        ", ".join(f"{f} [{s}]" if s else f for f, s in result["matches"]),
+                        search_index.get_unit(result["key"], field, section)
+                    ])
+                st.dataframe(pd.DataFrame(rows, columns=["Document", "Score", "Matched Fields/Sections", "Best Match"]))
+            else:
+                st.write("No matching agreements.")
+
+    # --- Agreements by Party ---
+    with st.expander("Find Agreements by Party"):
+        st.caption('Names are matched regardless of case, punctuation, legal suffixes such as Inc. or LLC, '
+                   'and role labels such as ("Provider").')
+        party_query = st.text_input("Party name")
+        party_role = st.selectbox("Named as", ["Any", "party", "vendor", "receiver"])
+        if party_query:
+            entity_index = get_entity_index()
+            documents = entity_index.documents_for(party_query, role=None if party_role == "Any" else party_role)
+            if documents:
+                st.write(f"{len(documents)} agreement(s):")
+                st.dataframe(pd.DataFrame(documents, columns=["Document"]))
+            else:
+                suggestions = entity_index.prefix_lookup(party_query) or [
+                    name for name, _ in entity_index.fuzzy_lookup(party_query)
+                ]
+                if suggestions:
+                    st.write("No exact match. Similar parties: " + "; ".join(suggestions))
+                else:
+                    st.write("No matching parties.")
 
-    if uploaded_file is not None:
+    # --- File Upload and Analysis ---
+    uploaded_files = st.file_uploader("Upload agreement files", type=["pdf", "docx", "txt", "png", "jpg", "jpeg"], accept_multiple_files=True)
+    # A single file is analyzed interactively; several files are analyzed in the background
+    uploaded_file = uploaded_files[0] if len(uploaded_files) == 1 else None
+
+    if len(uploaded_files) > 1:
+        st.write(f"{len(uploaded_files)} files selected")
+        if st.button("Analyze Agreements"):
+            api_key = st.secrets.get("GEMINI_API_KEY")
+            if get_backend_name() == "gemini" and (not api_key or api_key == "your_api_key_here"):
+                st.error("Please add your Gemini API key to the .streamlit/secrets.toml file.")
+                st.stop()
+
+            if not os.path.exists("temp_files"):
+                os.makedirs("temp_files")
+
+            analysis_queue = get_analysis_queue()
+            for batch_file in uploaded_files:
+                # Prefix with a unique ID so that files with the same name do not overwrite each other
+                file_path = os.path.join("temp_files", f"{uuid.uuid4().hex}_{batch_file.name}")
+                with open(file_path, "wb") as f:
+                    f.write(batch_file.getvalue())
+                analysis_queue.submit(batch_file.name, file_path, st.session_state.username)
+
+    elif uploaded_file is not None:
         # To read file as bytes:
         bytes_data = uploaded_file.getvalue()
         
@@ -249,21 +390,32 @@ else:
 
         st.write("Filename:", uploaded_file.name)
 
+        # Streaming shows each field as soon as the model has produced it
+        stream_results = st.checkbox("Show results as they are generated", value=True)
+
         if st.button("Analyze Agreement"):
             try:
                 with st.spinner("Analyzing..."):
-                    api_key = st.secrets["GEMINI_API_KEY"]
-                    if not api_key or api_key == "your_api_key_here":
+                    api_key = st.secrets.get("GEMINI_API_KEY")
+                    if get_backend_name() == "gemini" and (not api_key or api_key == "your_api_key_here"):
                         st.error("Please add your Gemini API key to the .streamlit/secrets.toml file.")
                         st.stop()
 
                     # --- Document Processing ---
+                    st.session_state.current_pdf_report = None
                     if uploaded_file.type.startswith('image/'):
                         tesseract_cmd = st.secrets.get("TESSERACT_CMD_PATH", None)
                         if not tesseract_cmd or tesseract_cmd == "your_tesseract_path_here":
                             st.error("Please add your Tesseract OCR path to the .streamlit/secrets.toml file.")
                             st.stop()
                         document_text = process_image(file_path, tesseract_cmd=tesseract_cmd)
+                    elif uploaded_file.name.lower().endswith('.pdf'):
+                        # Scanned pages are detected and sent through OCR; other pages use the text layer
+                        tesseract_cmd = st.secrets.get("TESSERACT_CMD_PATH", None)
+                        if tesseract_cmd == "your_tesseract_path_here":
+                            tesseract_cmd = None
+                        document_text, pdf_report = process_pdf_with_report(file_path, tesseract_cmd=tesseract_cmd)
+                        st.session_state.current_pdf_report = pdf_report
                     else:
                         document_text = get_file_processor(file_path)
                     
@@ -271,37 +423,42 @@ else:
                     st.session_state.current_document_text = document_text
 
                     # --- Data Extraction and Token Usage Calculation ---
-                    model = genai.GenerativeModel('gemini-1.5-flash')
-                    input_tokens = model.count_tokens(document_text).total_tokens
-
-                    #extracted_data = json.loads(st.session_state.current_extracted_data_markdown["text"])
-
-                    #parties = extracted_data.get("parties", "N/A")
                     prompt = f"Identify the Parties Involved, Vendor, and Receiver from the document text: {document_text}"
-                    analysis_result = analyze_text_with_llm(prompt, api_key)
-
-                    output_tokens = model.count_tokens(analysis_result).total_tokens
-                    total_tokens = input_tokens + output_tokens
-
-                    #extracted_data = json.loads(st.session_state.current_extracted_data_markdown["text"])
-                    extracted_data = json.loads(analysis_result["text"])
-                    #extracted_data["vendor"] = analysis_result.get("vendor", "N/A")
-                    #extracted_data["receiver"] = analysis_result.get("receiver", "N/A")
+                    if stream_results:
+                        st.subheader("Extracted Data")
+                        # Clicking Cancel reruns the script, which stops the stream
+                        st.button("Cancel Analysis")
+                        placeholders = {key: st.empty() for key in FIELD_NAMES}
+                        streamed_items = {}
+                        analysis_result = None
+                        for event, field, value in stream_analyze_text_with_llm(prompt, api_key):
+                            if event == "done":
+                                analysis_result = value
+                            elif field in placeholders:
+                                if event == "item":
+                                    # Show list fields such as risky clauses one element at a time
+                                    streamed_items.setdefault(field, []).append(value)
+                                    value = streamed_items[field]
+                                placeholders[field].markdown(f"**{DISPLAY_NAMES[field]}:** {format_value(value)}")
+                    else:
+                        analysis_result = analyze_text_with_llm(prompt, api_key)
 
-                    token_usage = {
-                        "input_tokens": input_tokens,
-                        "output_tokens": output_tokens,
-                        "total_tokens": total_tokens
-                    }
+                    if analysis_result.error:
+                        raise ValueError(f"{analysis_result.error}: {analysis_result.raw_response}")
+                    token_usage = document_token_usage(document_text, analysis_result.token_usage["output_tokens"], api_key)
 
                     # Store token usage for the current file in session state
                     st.session_state.current_token_usage = token_usage
                     
-                    # Store extracted data (Markdown table) in session state
-                    st.session_state.current_extracted_data_markdown = analysis_result
+                    # Store extracted data in session state
+                    st.session_state.current_extraction = analysis_result
 
                     # Add token log for the current user
                     add_token_log(st.session_state.username, uploaded_file.name, token_usage)
+
+                    # Keep the text and extracted fields searchable across the corpus
+                    get_search_index().add_document(uploaded_file.name, document_text, analysis_result.to_dict(), source="llm")
+                    get_entity_index().add_document(uploaded_file.name, analysis_result.to_dict(), key=document_key(document_text))
                     st.rerun() # Rerun to update the dashboard with new token usage
 
             except Exception as e:
@@ -314,36 +471,23 @@ else:
 
         # --- Display Document Preview and Extracted Data (from session state) ---
         
-        if st.session_state.get("current_extracted_data_markdown"):
+        if st.session_state.get("current_extraction"):
             col1, col2 = st.columns(2) # Create two columns for layout
 
             with col1:
                 st.subheader("Document Preview")
                 st.text_area("Agreement Content", st.session_state.current_document_text, height=500)
+                if st.session_state.current_pdf_report:
+                    with st.expander("PDF Page Report"):
+                        report_df = pd.DataFrame(st.session_state.current_pdf_report)
+                        report_df["seconds"] = report_df["seconds"].round(3)
+                        st.dataframe(report_df)
 
             with col2:
                 st.subheader("Extracted Data")
-                extracted_data = json.loads(st.session_state.current_extracted_data_markdown["text"])
-
-                agreement_terms = {
-                    "Parties Involved": "parties",
-                    "Effective Date": "effective_date",
-                    "Termination Clauses": "termination_clause",
-                    "Payment Terms": "payment_terms",
-                    "Confidentiality Obligations": "confidentiality_obligations",
-                    "Risky/Unusual Clauses": "risky_clauses",
-                    "Vendor": "vendor",
-                    "Receiver": "receiver"
-                }
-
-                data = []
-                for i, (term, key) in enumerate(agreement_terms.items()):
-                    value = extracted_data.get(key, "N/A")
-                    # Ensure all values are strings
-                    value = str(value) if value is not None else "N/A"
-                    data.append([term, value])
-
-                df = pd.DataFrame(data, columns=["Agreement Terms", "Data Extracted from the Agreement"])
+                extraction = st.session_state.current_extraction
+
+                df = pd.DataFrame(extraction.rows(), columns=["Agreement Terms", "Data Extracted from the Agreement"])
                 try:
                     st.dataframe(df)
                 except Exception as e:
@@ -351,59 +495,73 @@ else:
                     st.write(df.to_dict())
 
                 # --- Download Buttons ---
-                import io
-                def download_json():
-                    json_data = st.session_state.current_extracted_data_markdown["text"]
-                    return json_data.encode('utf-8')
-
-                def download_csv():
-                    extracted_data = json.loads(st.session_state.current_extracted_data_markdown["text"])
-                    
-                    agreement_terms_list = [
-                        "Parties Involved",
-                        "Effective Date",
-                        "Termination Clauses",
-                        "Payment Terms",
-                        "Confidentiality Obligations",
-                        "Risky/Unusual Clauses",
-                        "Vendor",
-                        "Receiver"
-                    ]
-                    
-                    data_for_csv = []
-                    for i, term_display_name in enumerate(agreement_terms_list):
-                        # Map display name to key used in extracted_data
-                        key_map = {
-                            "Parties Involved": "parties",
-                            "Effective Date": "effective_date",
-                            "Termination Clauses": "termination_clause",
-                            "Payment Terms": "payment_terms",
-                            "Confidentiality Obligations": "confidentiality_obligations",
-                            "Risky/Unusual Clauses": "risky_clauses",
-                            "Vendor": "vendor",
-                            "Receiver": "receiver"
-                        }
-                        key = key_map.get(term_display_name, term_display_name.lower().replace(" ", "_"))
-                        value = extracted_data.get(key, "N/A")
-                        value = str(value) if value is not None else "N/A"
-                        data_for_csv.append([i + 1, term_display_name, value])
-
-                    df_csv = pd.DataFrame(data_for_csv, columns=["Serial Number", "Agreement Terms", "Data Extracted from the Agreement"])
-                    csv_data = df_csv.to_csv(index=False).encode('utf-8')
-                    return csv_data
-
                 st.download_button(
                     label="Download as JSON",
-                    data=download_json(),
+                    data=extraction.to_json().encode('utf-8'),
                     file_name="extracted_data.json",
                     mime="application/json",
                 )
 
                 st.download_button(
                     label="Download as CSV",
-                    data=download_csv(),
+                    data=extraction.to_csv().encode('utf-8'),
                     file_name="extracted_data.csv",
                     mime="text/csv",
                 )
+
+                st.download_button(
+                    label="Download as Excel",
+                    data=extraction.to_xlsx(),
+                    file_name="extracted_data.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                )
     else:
         st.info("Please upload an agreement file to begin.")
+
+    # --- Background Analysis Progress ---
+    analysis_queue = st.session_state.get("analysis_queue")
+    if analysis_queue and analysis_queue.snapshot():
+        jobs = analysis_queue.snapshot()
+        st.subheader("Batch Analysis")
+
+        record_finished_jobs(jobs)
+
+        st.dataframe(pd.DataFrame([job.progress_row() for job in jobs]))
+        finished = [job for job in jobs if job.status == "done"]
+
+        if analysis_queue.pending():
+            st.caption(f"{sum(1 for job in jobs if job.done)} of {len(jobs)} files finished. Refreshing...")
+            time.sleep(1)
+            st.rerun()
+        else:
+            if finished:
+                named_results = [(job.filename, job.result) for job in finished]
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.download_button(
+                        label="Download All as JSON",
+                        data=results_to_json(named_results).encode('utf-8'),
+                        file_name="extracted_data_batch.json",
+                        mime="application/json",
+                    )
+                with col2:
+                    st.download_button(
+                        label="Download All as CSV",
+                        data=results_to_csv(named_results).encode('utf-8'),
+                        file_name="extracted_data_batch.csv",
+                        mime="text/csv",
+                    )
+                with col3:
+                    st.download_button(
+                        label="Download All as Excel",
+                        data=results_to_xlsx(named_results),
+                        file_name="extracted_data_batch.xlsx",
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    )
+
+                selected = st.selectbox("View Result", range(len(finished)), format_func=lambda i: finished[i].filename)
+                st.dataframe(pd.DataFrame(finished[selected].result.rows(), columns=["Agreement Terms", "Data Extracted from the Agreement"]))
+
+            if st.button("Clear Batch Results"):
+                analysis_queue.clear()
+                st.rerun()
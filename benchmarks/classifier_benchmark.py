@@ -0,0 +1,87 @@
+"""
+Throughput benchmark for the local clause classifier.
+
+Trains on synthetic agreement sections, then reports held-out accuracy and scoring
+throughput in sections per second.
+
+    python benchmarks/classifier_benchmark.py --sections 100000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clause_classifier import ClauseClassifier, CATEGORIES, featurize
+
+FILLER = (
+    "the parties agree that the services shall be performed in a professional manner consistent with "
+    "industry standards and applicable law including any reasonable instructions given by the client"
+).split()
+CLAUSES = {
+    "indemnification": [
+        "Provider shall indemnify and hold harmless Client from any and all claims.",
+        "Each party shall defend and hold the other harmless against third party claims.",
+        "Supplier agrees to indemnify Customer for all losses arising from its negligence.",
+    ],
+    "limitation_of_liability": [
+        "In no event shall either party be liable for indirect or consequential damages.",
+        "The aggregate liability of Provider shall not exceed the fees paid in the prior twelve months.",
+        "Provider shall not be liable for any loss of profits or data.",
+    ],
+    "auto_renewal": [
+        "This Agreement shall automatically renew for successive one year terms.",
+        "The term renews automatically unless either party gives ninety days written notice.",
+        "Upon expiry the subscription will auto-renew at the then current rates.",
+    ],
+    "exclusivity": [
+        "Client appoints Provider as its exclusive supplier of the Services in the Territory.",
+        "During the term Customer shall not engage any other vendor for similar services.",
+        "Distributor shall have the sole and exclusive right to sell the Products.",
+    ],
+}
+TITLES = ["Services", "Payment Terms", "Term", "Liability", "Indemnification", "Renewal", "Exclusivity", "General"]
+
+def make_section(rng, i):
+    labels = [category for category in CATEGORIES if rng.random() < 0.1]
+    sentences = [" ".join(rng.choices(FILLER, k=rng.randint(20, 60))).capitalize() + "."]
+    sentences.extend(rng.choice(CLAUSES[category]) for category in labels)
+    rng.shuffle(sentences)
+    return f"{i % 20 + 1}. {rng.choice(TITLES)}. {' '.join(sentences)}", labels
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the local clause classifier.")
+    parser.add_argument("--sections", type=int, default=100000, help="Number of synthetic sections to score.")
+    parser.add_argument("--train", type=int, default=5000, help="Number of synthetic sections to train on.")
+    parser.add_argument("--batch_size", type=int, default=1000, help="Sections scored per call.")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    train_texts, train_labels = zip(*(make_section(rng, i) for i in range(args.train)))
+    start = time.perf_counter()
+    classifier = ClauseClassifier().fit(list(train_texts), list(train_labels))
+    print(f"Trained on {args.train} sections in {time.perf_counter() - start:.1f}s")
+
+    texts, labels = zip(*(make_section(rng, i) for i in range(args.sections)))
+    correct = 0
+    start = time.perf_counter()
+    for offset in range(0, args.sections, args.batch_size):
+        batch = list(texts[offset:offset + args.batch_size])
+        probabilities = classifier.predict_proba(batch)
+        for row, expected in zip(probabilities, labels[offset:offset + args.batch_size]):
+            correct += [category for category, p in zip(CATEGORIES, row) if p >= 0.5] == expected
+    elapsed = time.perf_counter() - start
+    print(f"Scored {args.sections} sections in {elapsed:.2f}s ({args.sections / elapsed:.0f} sections/s), "
+          f"exact-match accuracy {correct / args.sections:.3f}")
+
+    start = time.perf_counter()
+    for offset in range(0, args.sections, args.batch_size):
+        featurize(texts[offset:offset + args.batch_size])
+    featurize_time = time.perf_counter() - start
+    print(f"Feature hashing alone: {args.sections / featurize_time:.0f} sections/s "
+          f"({featurize_time / elapsed:.0%} of scoring time)")
+
+if __name__ == "__main__":
+    main()
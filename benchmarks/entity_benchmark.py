@@ -0,0 +1,104 @@
+"""
+Latency benchmark for the entity index.
+
+Indexes the parties of synthetic agreements (300,000 by default, naming about 100,000
+distinct companies) and reports indexing throughput and lookup latency percentiles.
+
+    python benchmarks/entity_benchmark.py --documents 300000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from entity_index import EntityIndex, normalize_party
+from search_benchmark import percentile
+
+WORDS = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark", "Wayne", "Wonka", "Tyrell", "Cyberdyne",
+         "Northwind", "Contoso", "Fabrikam", "Vandelay", "Soylent", "Massive", "Dynamic", "Pioneer", "Summit", "Atlas"]
+KINDS = ["Holdings", "Systems", "Logistics", "Consulting", "Partners", "Industries", "Labs", "Services", ""]
+SUFFIXES = ["Inc.", "LLC", "Ltd.", "Corp.", "Corporation", "L.L.C.", ""]
+ROLES = ['("Provider")', '(the "Client")', "", "", ""]
+
+def company_names(count):
+    rng = random.Random(1)
+    names = set()
+    while len(names) < count:
+        names.add(" ".join(w for w in (rng.choice(WORDS), rng.choice(WORDS) + str(rng.randint(1, 999)), rng.choice(KINDS)) if w))
+    return sorted(names)
+
+def make_extraction(rng, companies):
+    # Spell each name the way agreements do: varying case, legal suffix and role label
+    vendor, receiver = (f"{rng.choice(companies)} {rng.choice(SUFFIXES)}".strip() for _ in range(2))
+    parties = [f"{vendor} {rng.choice(ROLES)}".strip(), receiver.upper() if rng.random() < 0.1 else receiver]
+    return {"parties": parties, "vendor": vendor, "receiver": receiver}
+
+def timed(function, queries, repeat=1):
+    timings = []
+    for _ in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            function(query)
+            timings.append((time.perf_counter() - start) * 1000)
+    return percentile(timings, 50), percentile(timings, 95), percentile(timings, 99)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the party entity index.")
+    parser.add_argument("--documents", type=int, default=300000, help="Number of synthetic agreements to index.")
+    parser.add_argument("--companies", type=int, default=100000, help="Number of distinct company names.")
+    parser.add_argument("--index", help="Index path (a temporary file is used by default).")
+    args = parser.parse_args()
+
+    index_path = args.index or os.path.join(tempfile.mkdtemp(), "entity_benchmark.db")
+    index = EntityIndex(index_path)
+    rng = random.Random(0)
+    companies = company_names(args.companies)
+
+    start = time.perf_counter()
+    batch = []
+    for i in range(args.documents):
+        batch.append((f"agreement_{i}.txt", make_extraction(rng, companies)))
+        if len(batch) == 5000:
+            index.add_documents(batch)
+            batch = []
+    if batch:
+        index.add_documents(batch)
+    elapsed = time.perf_counter() - start
+    print(f"Indexed {args.documents} documents in {elapsed:.1f}s ({args.documents / elapsed:.0f} docs/s), "
+          f"{len(index.keys)} distinct parties, index size {os.path.getsize(index_path) / 1e6:.0f} MB")
+
+    start = time.perf_counter()
+    index.add_document(f"agreement_{args.documents}.txt", make_extraction(rng, companies))
+    print(f"Incremental add: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    start = time.perf_counter()
+    reopened = EntityIndex(index_path)
+    print(f"Reopen (load {len(reopened.keys)} names): {time.perf_counter() - start:.2f}s")
+    reopened.close()
+
+    sample = rng.sample(companies, 200)
+    # Misspell by dropping one character
+    typos = [name[:i] + name[i + 1:] for name in sample for i in [rng.randrange(len(name))]]
+    print(f"{'lookup':24} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for label, function, queries in (
+        ("prefix (3 chars)", index.prefix_lookup, [name[:3] for name in sample]),
+        ("prefix (8 chars)", index.prefix_lookup, [name[:8] for name in sample]),
+        ("fuzzy (one typo)", index.fuzzy_lookup, typos),
+        ("documents for party", index.documents_for, sample),
+        ("documents for vendor", lambda name: index.documents_for(name, role="vendor"), sample),
+    ):
+        p50, p95, p99 = timed(function, queries, repeat=3)
+        print(f"{label:24} {p50:>8.3f} {p95:>8.3f} {p99:>8.3f}")
+
+    hits = 0
+    for name, typo in zip(sample, typos):
+        best = index.fuzzy_lookup(typo, limit=1)
+        hits += bool(best) and normalize_party(best[0][0]) == normalize_party(name)
+    print(f"Fuzzy top-1 recall on one-character typos: {hits / len(sample):.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+End-to-end load test of the analysis pipeline.
+
+Pushes synthetic agreements through the command-line path (one `main.py --use_llm`
+process per document) and the web app's background analysis path (AnalysisQueue with
+analyze_document) at a given concurrency, and reports throughput and latency percentiles.
+Runs against the fake LLM backend by default, so no API key or network is needed.
+
+    python benchmarks/load_test.py --documents 200 --concurrency 8 --profile realistic
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import FAKE_LLM_PROFILES
+from llm_backend import BACKENDS
+from search_benchmark import make_document, percentile
+
+def write_documents(directory, count):
+    rng = random.Random(0)
+    paths = []
+    for i in range(count):
+        name, text, _ = make_document(rng, i)
+        path = os.path.join(directory, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        paths.append(path)
+    return paths
+
+def classify_error(error):
+    return "rate_limited" if "429" in error else "failed"
+
+def run_cli(paths, concurrency):
+    """
+    Runs main.py once per document, `concurrency` processes at a time.
+    Returns a list of (latency_seconds, error) per document.
+    """
+    def run(path):
+        start = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, os.path.join(ROOT, "main.py"), path, "--use_llm"],
+            capture_output=True, text=True, cwd=ROOT
+        )
+        # main.py reports errors on stdout and still exits with status 0
+        output = completed.stdout.strip()
+        error = None if completed.returncode == 0 and output.startswith("{") else (output or completed.stderr.strip())
+        return time.perf_counter() - start, error
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(run, paths))
+
+def run_app(paths, concurrency):
+    """
+    Submits every document to an AnalysisQueue with `concurrency` workers, as the web app
+    does for a multi-file upload. Latency is measured from submission, so it includes the
+    time spent waiting in the queue. Returns a list of (latency_seconds, error) per document.
+    """
+    from main import analyze_document
+    from job_queue import AnalysisQueue
+
+    api_key = os.getenv("GEMINI_API_KEY")
+    queue = AnalysisQueue(lambda file_path: analyze_document(file_path, api_key), max_workers=concurrency)
+    jobs = [queue.submit(os.path.basename(path), path) for path in paths]
+    while queue.pending():
+        time.sleep(0.05)
+    queue.shutdown()
+    return [(job.finished_at - job.submitted_at, job.error) for job in jobs]
+
+def report(label, results, elapsed):
+    latencies = [latency for latency, error in results if error is None]
+    errors = [classify_error(error) for _, error in results if error is not None]
+    print(f"{label}: {len(results)} documents in {elapsed:.1f}s, {len(latencies) / elapsed:.2f} docs/s, "
+          f"{len(latencies)} ok, {errors.count('failed')} failed, {errors.count('rate_limited')} rate limited")
+    if latencies:
+        print(f"  latency p50 {percentile(latencies, 50):.2f}s  p95 {percentile(latencies, 95):.2f}s  "
+              f"p99 {percentile(latencies, 99):.2f}s  max {max(latencies):.2f}s")
+    sample = next((error for _, error in results if error is not None), None)
+    if sample:
+        print(f"  first error: {sample.splitlines()[0][:200]}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the agreement analysis pipeline.")
+    parser.add_argument("--documents", type=int, default=100, help="Number of synthetic agreements to analyze.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Number of documents analyzed at the same time.")
+    parser.add_argument("--path", choices=("cli", "app", "all"), default="all", help="Analysis path to exercise.")
+    parser.add_argument("--backend", choices=BACKENDS, default="fake", help="LLM backend to use.")
+    parser.add_argument("--profile", choices=tuple(FAKE_LLM_PROFILES), default="realistic",
+                        help="Latency, error and rate-limit profile of the fake backend.")
+    args = parser.parse_args()
+
+    # Set in the environment so that the main.py processes use the same backend
+    os.environ["LLM_BACKEND"] = args.backend
+    os.environ["FAKE_LLM_PROFILE"] = args.profile
+
+    paths = write_documents(tempfile.mkdtemp(), args.documents)
+    print(f"Backend {args.backend}" + (f" (profile {args.profile})" if args.backend == "fake" else "") +
+          f", concurrency {args.concurrency}")
+
+    runs = {"cli": run_cli, "app": run_app}
+    for name in (("cli", "app") if args.path == "all" else (args.path,)):
+        start = time.perf_counter()
+        results = runs[name](paths, args.concurrency)
+        report(name, results, time.perf_counter() - start)
+
+if __name__ == "__main__":
+    main()
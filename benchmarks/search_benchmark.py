@@ -0,0 +1,105 @@
+"""
+Latency benchmark for the search index.
+
+Builds an index of synthetic agreements (100,000 by default) and reports indexing
+throughput and query latency percentiles.
+
+    python benchmarks/search_benchmark.py --documents 100000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_index import SearchIndex
+
+COMPANIES = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark", "Wayne", "Wonka", "Tyrell", "Cyberdyne"]
+SUFFIXES = ["Inc.", "LLC", "Ltd.", "Corp."]
+FILLER = (
+    "the parties agree that the services shall be performed in a professional manner consistent with "
+    "industry standards and applicable law including any reasonable instructions given by the client"
+).split()
+INDEMNITY = [
+    "Provider shall indemnify and hold harmless Client from any and all claims.",
+    "Provider shall provide unlimited indemnification for third party claims.",
+    "Each party shall indemnify the other for losses caused by its negligence.",
+]
+QUERIES = [
+    "unlimited indemnification",
+    '"payment due within 90 days"',
+    'risky_clauses:"unlimited indemnification"',
+    "parties:globex",
+    '"terminate for convenience" notice',
+    "confidential",
+]
+
+def make_document(rng, i):
+    party_a = f"{rng.choice(COMPANIES)} {i} {rng.choice(SUFFIXES)}"
+    party_b = f"{rng.choice(COMPANIES)} {rng.choice(SUFFIXES)}"
+    days = rng.choice([15, 30, 45, 60, 90])
+    indemnity = rng.choice(INDEMNITY)
+    sections = [
+        f"This Agreement is made between {party_a} and {party_b}.",
+        f"1. Services. {' '.join(rng.choices(FILLER, k=60))}",
+        f"2. Payment Terms. Payment due within {days} days of invoice.",
+        f"3. Termination. Either party may terminate for convenience with {rng.choice([30, 60])} days notice.",
+        f"4. Indemnification. {indemnity}",
+        f"5. Confidentiality. Each party shall keep the other party's information confidential. {' '.join(rng.choices(FILLER, k=30))}",
+    ]
+    text = "\n".join(sections)
+    extraction = {
+        "parties": [party_a, party_b],
+        "payment_terms": f"Payment due within {days} days of invoice.",
+        "risky_clauses": [{"clause_text": indemnity, "explanation": "Broad indemnification obligation."}],
+    }
+    return f"agreement_{i}.txt", text, extraction
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the agreement search index.")
+    parser.add_argument("--documents", type=int, default=100000, help="Number of synthetic agreements to index.")
+    parser.add_argument("--repeat", type=int, default=20, help="Number of runs per query.")
+    parser.add_argument("--index", help="Index path (a temporary file is used by default).")
+    args = parser.parse_args()
+
+    index_path = args.index or os.path.join(tempfile.mkdtemp(), "search_benchmark.db")
+    index = SearchIndex(index_path)
+    rng = random.Random(0)
+
+    start = time.perf_counter()
+    batch = []
+    for i in range(args.documents):
+        batch.append(make_document(rng, i))
+        if len(batch) == 1000:
+            index.add_documents(batch)
+            batch = []
+    if batch:
+        index.add_documents(batch)
+    elapsed = time.perf_counter() - start
+    print(f"Indexed {args.documents} documents in {elapsed:.1f}s ({args.documents / elapsed:.0f} docs/s), "
+          f"index size {os.path.getsize(index_path) / 1e6:.0f} MB")
+
+    # Incremental update of a single document on the full index
+    start = time.perf_counter()
+    index.add_document(*make_document(rng, args.documents))
+    print(f"Incremental add: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    print(f"{'query':45} {'hits':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for query in QUERIES:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            index.search(query, limit=20)
+            timings.append((time.perf_counter() - start) * 1000)
+        hits = len(index.search(query, limit=None))
+        print(f"{query:45} {hits:>8} {percentile(timings, 50):>8.1f} {percentile(timings, 95):>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+import os
+import re
+import json
+import zlib
+import argparse
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from utils import split_sections
+from search_index import SearchIndex
+
+CATEGORIES = ("indemnification", "limitation_of_liability", "auto_renewal", "exclusivity")
+
+# Used to turn the risky clauses found by the LLM into category labels for training
+CATEGORY_KEYWORDS = {
+    "indemnification": ("indemnif", "hold harmless", "defend and hold"),
+    "limitation_of_liability": ("limitation of liability", "limit liability", "shall not be liable",
+                                "consequential damages", "indirect damages", "aggregate liability"),
+    "auto_renewal": ("automatically renew", "auto-renew", "automatic renewal", "renew automatically",
+                     "successive renewal"),
+    "exclusivity": ("exclusive", "exclusivity", "non-compete", "sole provider", "sole supplier"),
+}
+
+NUM_FEATURES = 2 ** 18
+# Risky clauses shorter than this (e.g. single regex keywords) are not used as training labels
+MIN_CLAUSE_CHARS = 20
+TRIAGE_THRESHOLD = 0.5
+CLASSIFIER_MODEL_FILE = "clause_classifier.npz"
+
+def require_numpy():
+    if np is None:
+        raise ImportError("numpy is not installed. Please install it with 'pip install numpy'")
+
+def categorize_clause(clause_text):
+    """
+    Returns the categories whose keywords appear in a risky clause and its explanation.
+    """
+    lowered = clause_text.lower()
+    return [category for category in CATEGORIES if any(k in lowered for k in CATEGORY_KEYWORDS[category])]
+
+def featurize(texts):
+    """
+    Turns texts into an L2-normalized sparse matrix of hashed unigram and bigram counts,
+    returned as CSR arrays (indptr, indices, data).
+    """
+    require_numpy()
+    indptr = [0]
+    indices = []
+    data = []
+    mask = NUM_FEATURES - 1
+    for text in texts:
+        words = re.findall(rb"[a-z]+", text.lower().encode("utf-8"))
+        counts = Counter([zlib.crc32(word) & mask for word in words] +
+                         [zlib.crc32(a + b" " + b) & mask for a, b in zip(words, words[1:])])
+        indices.extend(counts)
+        data.extend(counts.values())
+        indptr.append(len(indices))
+
+    indptr = np.asarray(indptr, dtype=np.int64)
+    indices = np.asarray(indices, dtype=np.int64)
+    data = np.asarray(data, dtype=np.float32)
+    if len(data):
+        # Sublinear term frequency, then L2-normalize each row
+        data = 1.0 + np.log(data)
+        rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+        norms = np.sqrt(np.bincount(rows, weights=data * data, minlength=len(indptr) - 1))
+        data = (data / norms[rows]).astype(np.float32)
+    return indptr, indices, data
+
+def examples_from_results(documents):
+    """
+    Builds training examples from previously LLM-labelled documents.
+    `documents` is an iterable of (text, extraction) pairs; every section of the text is an
+    example, labelled with the categories of the risky clauses found in it.
+    Returns (section_texts, labels), labels being a list of category lists.
+    """
+    texts = []
+    labels = []
+    for text, extraction in documents:
+        clauses = []
+        for item in (extraction or {}).get("risky_clauses") or []:
+            if isinstance(item, dict):
+                clause_text = item.get("clause_text") or ""
+                description = clause_text + " " + (item.get("explanation") or "")
+            else:
+                clause_text = description = str(item)
+            if len(clause_text) >= MIN_CLAUSE_CHARS:
+                clauses.append((" ".join(clause_text.split())[:MIN_CLAUSE_CHARS * 3], categorize_clause(description)))
+
+        for _, _, section_text in split_sections(text):
+            normalized = " ".join(section_text.split())
+            section_labels = set()
+            for clause_start, categories in clauses:
+                if clause_start in normalized:
+                    section_labels.update(categories)
+            texts.append(section_text)
+            labels.append(sorted(section_labels))
+    return texts, labels
+
+def examples_from_search_index(search_index):
+    """
+    Builds training examples from the documents stored in a SearchIndex. Only documents
+    analyzed by the LLM are used: the regex extractor reports keywords rather than clauses,
+    so its documents would only add unlabelled sections.
+    """
+    return examples_from_results(
+        (text, extraction) for _, _, text, extraction in search_index.iter_extractions(source="llm")
+    )
+
+class ClauseClassifier:
+    """
+    One-vs-rest logistic regression over hashed word features that scores agreement
+    sections for each risk category. Runs on CPU with NumPy only.
+    """
+
+    def __init__(self, weights=None, bias=None):
+        require_numpy()
+        self.weights = weights if weights is not None else np.zeros((NUM_FEATURES, len(CATEGORIES)), dtype=np.float32)
+        self.bias = bias if bias is not None else np.zeros(len(CATEGORIES), dtype=np.float32)
+
+    def _scores(self, features):
+        indptr, indices, data = features
+        num_rows = len(indptr) - 1
+        rows = np.repeat(np.arange(num_rows), np.diff(indptr))
+        contributions = self.weights[indices] * data[:, None]
+        scores = np.empty((num_rows, len(CATEGORIES)), dtype=np.float32)
+        for c in range(len(CATEGORIES)):
+            scores[:, c] = np.bincount(rows, weights=contributions[:, c], minlength=num_rows)
+        return scores + self.bias
+
+    def fit(self, texts, labels, epochs=100, learning_rate=2.0, l2=1e-5):
+        """
+        Trains on section texts and their category lists with full-batch gradient descent.
+        Positive examples are weighted up so that rare categories are not ignored.
+        """
+        features = featurize(texts)
+        indptr, indices, data = features
+        rows = np.repeat(np.arange(len(texts)), np.diff(indptr))
+        targets = np.array([[category in row for category in CATEGORIES] for row in labels], dtype=np.float32)
+
+        positives = targets.sum(axis=0)
+        sample_weights = np.where(targets > 0, (len(texts) - positives) / np.maximum(positives, 1), 1.0)
+        sample_weights /= sample_weights.mean(axis=0)
+
+        for _ in range(epochs):
+            probabilities = 1.0 / (1.0 + np.exp(-self._scores(features)))
+            errors = (probabilities - targets) * sample_weights / len(texts)
+            for c in range(len(CATEGORIES)):
+                gradient = np.bincount(indices, weights=data * errors[rows, c], minlength=NUM_FEATURES)
+                self.weights[:, c] -= learning_rate * (gradient.astype(np.float32) + l2 * self.weights[:, c])
+            self.bias -= learning_rate * errors.sum(axis=0)
+        return self
+
+    def predict_proba(self, texts):
+        """
+        Returns an array of shape (len(texts), len(CATEGORIES)) with the probability of each category.
+        """
+        if not texts:
+            return np.zeros((0, len(CATEGORIES)), dtype=np.float32)
+        return 1.0 / (1.0 + np.exp(-self._scores(featurize(texts))))
+
+    def triage(self, text, threshold=TRIAGE_THRESHOLD):
+        """
+        Scores every section of an agreement and decides whether it needs an LLM review.
+        Returns a dict with the decision, the highest score per category and the flagged sections.
+        """
+        sections = split_sections(text)
+        probabilities = self.predict_proba([section_text for _, _, section_text in sections])
+        flagged = []
+        for (number, title, _), row in zip(sections, probabilities):
+            categories = [category for category, p in zip(CATEGORIES, row) if p >= threshold]
+            if categories:
+                flagged.append({"section": f"{number}. {title}", "categories": categories})
+        top_scores = probabilities.max(axis=0) if len(probabilities) else np.zeros(len(CATEGORIES))
+        return {
+            "needs_llm_review": bool(flagged),
+            "scores": {category: round(float(p), 3) for category, p in zip(CATEGORIES, top_scores)},
+            "flagged_sections": flagged
+        }
+
+    def save(self, path=CLASSIFIER_MODEL_FILE):
+        np.savez_compressed(path, weights=self.weights, bias=self.bias, categories=np.array(CATEGORIES))
+
+    @classmethod
+    def load(cls, path=CLASSIFIER_MODEL_FILE):
+        require_numpy()
+        with np.load(path) as model:
+            if tuple(model["categories"]) != CATEGORIES:
+                raise ValueError(f"The classifier model at {path} was trained for different categories.")
+            return cls(model["weights"], model["bias"])
+
+def main():
+    """
+    Command-line training and triage.
+    """
+    parser = argparse.ArgumentParser(description="Train or run the local risky clause classifier.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    train_parser = subparsers.add_parser("train", help="Train on the LLM results stored in the search index.")
+    train_parser.add_argument("--index", default="search_index.db", help="Path to the search index.")
+    train_parser.add_argument("--model", default=CLASSIFIER_MODEL_FILE, help="Where to save the model.")
+    triage_parser = subparsers.add_parser("triage", help="Score the sections of an agreement.")
+    triage_parser.add_argument("file_path", help="Path to the agreement file.")
+    triage_parser.add_argument("--model", default=CLASSIFIER_MODEL_FILE, help="Path to the model.")
+    triage_parser.add_argument("--threshold", type=float, default=TRIAGE_THRESHOLD, help="Minimum category probability.")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "train":
+            if not os.path.exists(args.index):
+                raise FileNotFoundError(f"Search index not found at {args.index}")
+            texts, labels = examples_from_search_index(SearchIndex(args.index))
+            if not texts:
+                raise ValueError(f"No LLM-analyzed agreements found in {args.index}")
+            counts = {category: sum(category in row for row in labels) for category in CATEGORIES}
+            ClauseClassifier().fit(texts, labels).save(args.model)
+            print(f"Trained on {len(texts)} sections ({counts}); model saved to {args.model}")
+        else:
+            # Imported here because main imports this module
+            from main import get_file_processor
+            result = ClauseClassifier.load(args.model).triage(get_file_processor(args.file_path), args.threshold)
+            print(json.dumps(result, indent=2))
+    except (FileNotFoundError, ValueError, ImportError) as e:
+        print(f"Error: {e}")
+
+if __name__ == "__main__":
+    main()
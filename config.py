@@ -9,3 +9,33 @@ PATTERNS = {
     "risky_clauses": r"indemnify|liability|warranty",
     # Add more patterns as needed
 }
+
+# Plain-text files larger than this are scanned through a memory map in overlapping windows
+# instead of being read into memory (see processors/large_text_processor.py)
+LARGE_TEXT_THRESHOLD = 32 * 1024 * 1024
+LARGE_TEXT_CHUNK_SIZE = 8 * 1024 * 1024
+LARGE_TEXT_OVERLAP = 64 * 1024
+
+# PDF pages whose text layer is shorter than this, or has a lower share of letters, digits,
+# punctuation and spaces, are treated as scanned and sent through OCR
+PDF_MIN_PAGE_CHARS = 50
+PDF_MIN_TEXT_QUALITY = 0.8
+PDF_OCR_DPI = 300
+# Size of the process pool shared by all PDF OCR in one program (capped at the number of CPUs)
+PDF_OCR_MAX_WORKERS = 4
+
+# Number of uploaded documents the web app analyzes at the same time, across all sessions
+ANALYSIS_MAX_WORKERS = 4
+
+# Language model used for analysis: "gemini", or "fake" for offline development and load tests
+# (see llm_backend.py). Overridden by the LLM_BACKEND and FAKE_LLM_PROFILE environment variables.
+LLM_BACKEND = "gemini"
+GEMINI_MODEL = "gemini-1.5-flash"
+FAKE_LLM_PROFILE = "realistic"
+FAKE_LLM_PROFILES = {
+    "instant": {},
+    "realistic": {"latency": 1.5, "jitter": 0.3, "tokens_per_second": 150},
+    "flaky": {"latency": 1.5, "jitter": 0.5, "tokens_per_second": 150, "error_rate": 0.1, "malformed_rate": 0.05},
+    # Requests per minute of the Gemini free tier
+    "rate_limited": {"latency": 1.5, "jitter": 0.3, "tokens_per_second": 150, "rate_limit": 15},
+}
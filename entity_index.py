@@ -0,0 +1,351 @@
+import re
+import sys
+import json
+import heapq
+import sqlite3
+import threading
+import argparse
+from bisect import bisect_left, insort
+from datetime import datetime
+from collections import Counter
+
+from search_index import SearchIndex
+from utils import document_key
+
+ENTITY_INDEX_FILE = "entity_index.db"
+FUZZY_THRESHOLD = 0.4
+# Work limits of a fuzzy lookup: the number of names read from the query's trigram posting
+# lists (rarest first; the first FUZZY_FIRST_TRIGRAMS lists are always read) and the number
+# of names scored
+FUZZY_MAX_POSTINGS = 1000
+FUZZY_FIRST_TRIGRAMS = 3
+FUZZY_CANDIDATES = 50
+
+# Extracted fields that name a party, and the role each one is indexed under
+PARTY_FIELDS = {"parties": "party", "vendor": "vendor", "receiver": "receiver"}
+
+# Legal form suffixes dropped from the end of a normalized name
+LEGAL_SUFFIXES = {
+    "inc", "incorporated", "llc", "l l c", "ltd", "limited", "corp", "corporation", "co", "company",
+    "plc", "lp", "llp", "l p", "gmbh", "ag", "sa", "bv", "nv", "pty", "pvt", "private",
+    "and co", "and company",
+}
+_MAX_SUFFIX_WORDS = max(len(suffix.split()) for suffix in LEGAL_SUFFIXES)
+
+# Role labels such as ("Provider"), (the "Client"), (herein "Buyer") or , hereinafter "Vendor"
+ROLE_LABEL = re.compile(
+    r'\(\s*(?:(?:hereinafter|herein)\s+)?(?:(?:called|referred\s+to\s+as)\s+)?(?:the\s+)?["“”\'][^)]*\)'
+    r'|,?\s*\(?\s*(?:hereinafter|herein)\b.*$',
+    re.IGNORECASE
+)
+
+def clean_name(name):
+    """
+    Lowercases a party name and removes role labels and punctuation.
+    """
+    name = ROLE_LABEL.sub(" ", name).lower().replace("&", " and ")
+    return " ".join(re.findall(r"\w+", name.replace(".", "")))
+
+def normalize_party(name):
+    """
+    Returns the key a party name is indexed under, e.g. 'Acme, Inc. ("Provider")' -> "acme".
+    Returns None if nothing is left.
+    """
+    words = clean_name(name).split()
+    if words and words[0] == "the" and len(words) > 1:
+        words = words[1:]
+    while len(words) > 1:
+        for size in range(min(_MAX_SUFFIX_WORDS, len(words) - 1), 0, -1):
+            if " ".join(words[-size:]) in LEGAL_SUFFIXES:
+                words = words[:-size]
+                break
+        else:
+            break
+    return " ".join(words) or None
+
+def display_name(name):
+    """
+    Returns the party name without role labels, for display.
+    """
+    return " ".join(ROLE_LABEL.sub(" ", name).split()).strip(" ,;")
+
+def extraction_key(extraction):
+    """
+    Returns the default document key of an extraction: document_key of its JSON.
+    """
+    return document_key(json.dumps(extraction, sort_keys=True))
+
+def trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def extraction_parties(extraction):
+    """
+    Yields (name, role) for every party named in an extraction.
+    """
+    for field, role in PARTY_FIELDS.items():
+        value = extraction.get(field)
+        for name in value if isinstance(value, list) else [value]:
+            if isinstance(name, str) and name.strip():
+                yield name, role
+
+class EntityIndex:
+    """
+    Persistent index from normalized party names to the agreements that name them, stored in SQLite.
+
+    Every distinct normalized name is interned once; an in-memory sorted list of names
+    answers prefix lookups with bisect, and a trigram index answers fuzzy lookups.
+    Agreements are identified by a key, like in SearchIndex, and listed by their display name.
+    """
+
+    def __init__(self, db_path=ENTITY_INDEX_FILE):
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        # The connection is shared between app sessions, which run in different threads
+        self.lock = threading.RLock()
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entities (
+                entity_id INTEGER PRIMARY KEY,
+                key TEXT UNIQUE NOT NULL,
+                name TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_id INTEGER PRIMARY KEY,
+                key TEXT UNIQUE NOT NULL,
+                name TEXT NOT NULL,
+                indexed_at TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS mentions (
+                entity_id INTEGER NOT NULL,
+                doc_id INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                PRIMARY KEY (entity_id, doc_id, role)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS mentions_by_doc ON mentions (doc_id);
+        """)
+        if "key" not in [row[1] for row in self.conn.execute("PRAGMA table_info(documents)")]:
+            # Indexes created when documents were keyed by name; the name becomes their key
+            with self.conn:
+                self.conn.execute("ALTER TABLE documents RENAME TO documents_by_name")
+                self.conn.execute("""
+                    CREATE TABLE documents (
+                        doc_id INTEGER PRIMARY KEY,
+                        key TEXT UNIQUE NOT NULL,
+                        name TEXT NOT NULL,
+                        indexed_at TEXT NOT NULL
+                    )
+                """)
+                self.conn.execute("""
+                    INSERT INTO documents (doc_id, key, name, indexed_at)
+                    SELECT doc_id, name, name, indexed_at FROM documents_by_name
+                """)
+                self.conn.execute("DROP TABLE documents_by_name")
+        self.entities = {}
+        self.keys = []
+        self.trigram_index = {}
+        # Number of distinct trigrams of each name, to bound similarities without building the set
+        self.trigram_counts = {}
+        for entity_id, key, name in self.conn.execute("SELECT entity_id, key, name FROM entities"):
+            self._remember(entity_id, key, name)
+        self.keys.sort()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def _remember(self, entity_id, key, name):
+        key = sys.intern(key)
+        self.entities[key] = (entity_id, name)
+        self.keys.append(key)
+        key_trigrams = trigrams(key)
+        self.trigram_counts[key] = len(key_trigrams)
+        for trigram in key_trigrams:
+            self.trigram_index.setdefault(trigram, set()).add(key)
+
+    def _entity_id(self, key, name):
+        if key in self.entities:
+            return self.entities[key][0]
+        row = self.conn.execute("SELECT entity_id, name FROM entities WHERE key = ?", (key,)).fetchone()
+        if row:
+            # Added by another process since the index was opened
+            entity_id, name = row
+        else:
+            entity_id = self.conn.execute("INSERT INTO entities (key, name) VALUES (?, ?)", (key, name)).lastrowid
+        self._remember(entity_id, key, name)
+        # Keep the list sorted; _remember appended the key at the end
+        key = self.keys.pop()
+        insort(self.keys, key)
+        return entity_id
+
+    def _add(self, key, name, extraction):
+        row = self.conn.execute("SELECT doc_id FROM documents WHERE key = ?", (key,)).fetchone()
+        if row:
+            # Re-indexing a document replaces its mentions
+            doc_id = row[0]
+            self.conn.execute("DELETE FROM mentions WHERE doc_id = ?", (doc_id,))
+            self.conn.execute(
+                "UPDATE documents SET name = ?, indexed_at = ? WHERE doc_id = ?", (name, datetime.now().isoformat(), doc_id)
+            )
+        else:
+            doc_id = self.conn.execute(
+                "INSERT INTO documents (key, name, indexed_at) VALUES (?, ?, ?)", (key, name, datetime.now().isoformat())
+            ).lastrowid
+
+        mentions = set()
+        for party, role in extraction_parties(extraction or {}):
+            key = normalize_party(party)
+            if key:
+                mentions.add((self._entity_id(key, display_name(party)), doc_id, role))
+        self.conn.executemany("INSERT INTO mentions (entity_id, doc_id, role) VALUES (?, ?, ?)", mentions)
+        return doc_id
+
+    def add_document(self, name, extraction, key=None):
+        """
+        Indexes (or re-indexes) the parties, vendor and receiver of one processed agreement
+        under `key`, with `name` as its display name. Pass the key the agreement has in the
+        search index (document_key of its text); by default a hash of the extraction is used.
+        Returns the key.
+        """
+        key = key or extraction_key(extraction)
+        with self.lock, self.conn:
+            self._add(key, name, extraction)
+        return key
+
+    def add_documents(self, documents):
+        """
+        Indexes an iterable of (name, extraction) pairs in a single transaction, each under
+        the hash of its extraction.
+        """
+        with self.lock, self.conn:
+            for name, extraction in documents:
+                self._add(extraction_key(extraction), name, extraction)
+
+    def documents_for(self, party, role=None):
+        """
+        Returns the names of the agreements that name the party, one per agreement, optionally
+        only in one role ("party", "vendor" or "receiver").
+        """
+        query = ("SELECT DISTINCT doc_id, documents.name FROM entities JOIN mentions USING (entity_id) "
+                 "JOIN documents USING (doc_id) WHERE entities.key = ?")
+        params = [normalize_party(party)]
+        if role:
+            query += " AND role = ?"
+            params.append(role)
+        with self.lock:
+            return [name for _, name in self.conn.execute(query + " ORDER BY documents.name, doc_id", params)]
+
+    def prefix_lookup(self, prefix, limit=10):
+        """
+        Returns the display names of up to `limit` parties whose normalized name starts with the prefix.
+        The prefix is normalized like the names, so "Acme Inc" finds "Acme Holdings Ltd.".
+        """
+        prefix = normalize_party(prefix)
+        if not prefix:
+            return []
+        with self.lock:
+            start = bisect_left(self.keys, prefix)
+            matches = []
+            for key in self.keys[start:start + limit]:
+                if not key.startswith(prefix):
+                    break
+                matches.append(self.entities[key][1])
+        return matches
+
+    def fuzzy_lookup(self, party, limit=10, threshold=FUZZY_THRESHOLD):
+        """
+        Returns up to `limit` (display_name, similarity) pairs for the parties whose trigram sets
+        have a Jaccard similarity of at least `threshold` with the given name, best first.
+
+        A name with similarity s shares at least s * n of the query's n trigrams. Posting lists
+        are read rarest first (a typo's own trigrams usually have none) until FUZZY_MAX_POSTINGS
+        names have been read, and only the FUZZY_CANDIDATES names sharing the most trigrams are
+        scored, skipping those whose trigram count rules them out. This keeps a lookup under a
+        millisecond on large indexes; the price is that when a name shares only common trigrams
+        with the query, a weaker match can be missed.
+        """
+        key = normalize_party(party)
+        if not key:
+            return []
+        query = trigrams(key)
+        size = len(query)
+        with self.lock:
+            ordered = sorted(query, key=lambda trigram: len(self.trigram_index.get(trigram, ())))
+            counts = Counter()
+            scanned = 0
+            postings = 0
+            for trigram in ordered:
+                names = self.trigram_index.get(trigram, ())
+                if scanned >= FUZZY_FIRST_TRIGRAMS and postings + len(names) > FUZZY_MAX_POSTINGS:
+                    break
+                counts.update(names)
+                postings += len(names)
+                scanned += 1
+
+            # A candidate can share at most every unread trigram of the query as well
+            unscanned = size - scanned
+            min_seen = threshold * size - unscanned
+            candidates = heapq.nlargest(FUZZY_CANDIDATES, ((seen, candidate) for candidate, seen in counts.items()
+                                                           if seen >= min_seen))
+            # Min-heap of the best (similarity, candidate) pairs found so far
+            best = []
+            for seen, candidate in candidates:
+                min_similarity = best[0][0] if len(best) >= limit else threshold
+                if seen + unscanned < min_similarity * size:
+                    break
+                candidate_size = self.trigram_counts[candidate]
+                overlap = min(seen + unscanned, candidate_size)
+                if overlap / (size + candidate_size - overlap) < min_similarity:
+                    continue
+                overlap = len(query & trigrams(candidate))
+                similarity = overlap / (size + candidate_size - overlap)
+                if similarity >= min_similarity:
+                    heapq.heappush(best, (similarity, candidate))
+                    if len(best) > limit:
+                        heapq.heappop(best)
+
+            scored = sorted(best, key=lambda item: (-item[0], item[1]))
+            return [(self.entities[candidate][1], round(similarity, 3)) for similarity, candidate in scored]
+
+    def import_search_index(self, search_index):
+        """
+        Indexes the parties of every agreement stored in a SearchIndex with its extraction,
+        under the same keys. Returns the number of agreements.
+        """
+        count = 0
+        with self.lock, self.conn:
+            for key, name, _, extraction in search_index.iter_extractions():
+                self._add(key, name, extraction)
+                count += 1
+        return count
+
+def main():
+    """
+    Command-line lookup of the agreements naming a party.
+    """
+    parser = argparse.ArgumentParser(description="Look up the agreements that name a party.")
+    parser.add_argument("party", nargs="?", help="Party name, e.g. 'Acme Inc.'")
+    parser.add_argument("--index", default=ENTITY_INDEX_FILE, help="Path to the entity index.")
+    parser.add_argument("--role", choices=tuple(PARTY_FIELDS.values()), help="Only agreements naming the party in this role.")
+    parser.add_argument("--prefix", action="store_true", help="List the parties whose name starts with the given text.")
+    parser.add_argument("--fuzzy", action="store_true", help="List the parties with a similar name.")
+    parser.add_argument("--import_search_index", help="Index the parties of every agreement in this search index first.")
+    args = parser.parse_args()
+
+    index = EntityIndex(args.index)
+    if args.import_search_index:
+        count = index.import_search_index(SearchIndex(args.import_search_index))
+        print(f"Indexed the parties of {count} agreements.")
+    if not args.party:
+        return
+
+    if args.prefix:
+        for name in index.prefix_lookup(args.party, limit=20):
+            print(name)
+    elif args.fuzzy:
+        for name, similarity in index.fuzzy_lookup(args.party, limit=20):
+            print(f"{name} ({similarity})")
+    else:
+        for name in index.documents_for(args.party, role=args.role):
+            print(name)
+
+if __name__ == "__main__":
+    main()
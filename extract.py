@@ -1,3 +1,4 @@
+import os
 import json
 import re
 from ai_analyzer import analyze_text_with_llm # Import the LLM analysis function
@@ -21,28 +22,15 @@ Party A: ____________________
 Party B: ____________________"""
 
     # Use the LLM to analyze the text and extract structured data
-    # The API key is now hardcoded in ai_analyzer.py, so we pass a dummy value here.
-    llm_analysis_result = analyze_text_with_llm(sample_agreement_text, "dummy_api_key")
+    # Set LLM_BACKEND=fake to run without a Gemini API key
+    llm_analysis_result = analyze_text_with_llm(sample_agreement_text, os.getenv("GEMINI_API_KEY"))
 
-    if "error" in llm_analysis_result:
-        print(f"Error during LLM analysis: {llm_analysis_result['error']}")
+    if llm_analysis_result.error:
+        print(f"Error during LLM analysis: {llm_analysis_result.error}")
         return {}
-    
-    # The LLM returns a JSON string in the 'text' field
-    extracted_data = json.loads(llm_analysis_result["text"])
-
-    # Map the LLM output keys to the desired output keys for the CSV
-    # This step is crucial to ensure the CSV headers match the user's request
-    final_data = {
-        "Parties Involved": extracted_data.get("parties", "Not specified"),
-        "Effective Date": extracted_data.get("effective_date", "Not specified"),
-        "Termination Clauses": extracted_data.get("termination_clause", "Not specified"),
-        "Payment Terms": extracted_data.get("payment_terms", "Not specified"),
-        "Confidentiality Obligations": extracted_data.get("confidentiality_obligations", "Not specified"),
-        "Risky/Unusual Clauses": extracted_data.get("risky_clauses", []),
-        "Vendor": extracted_data.get("vendor", "Not specified"),
-        "Receiver": extracted_data.get("receiver", "Not specified")
-    }
+
+    # Use the display names so that the CSV headers match the user's request
+    final_data = llm_analysis_result.to_display_dict()
 
     return final_data
 
@@ -0,0 +1,153 @@
+import io
+import csv
+import json
+
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+# Extracted fields and their display names, in output order
+FIELDS = (
+    ("parties", "Parties Involved"),
+    ("effective_date", "Effective Date"),
+    ("termination_clause", "Termination Clauses"),
+    ("payment_terms", "Payment Terms"),
+    ("confidentiality_obligations", "Confidentiality Obligations"),
+    ("risky_clauses", "Risky/Unusual Clauses"),
+    ("vendor", "Vendor"),
+    ("receiver", "Receiver"),
+)
+FIELD_NAMES = tuple(key for key, _ in FIELDS)
+DISPLAY_NAMES = dict(FIELDS)
+LIST_FIELDS = ("parties", "risky_clauses")
+
+CSV_HEADER = ("Serial Number", "Agreement Terms", "Data Extracted from the Agreement")
+
+def format_value(value):
+    """
+    Formats an extracted value as display text.
+    """
+    if value is None:
+        return "N/A"
+    if isinstance(value, dict):
+        return "; ".join(f"{k}: {v}" for k, v in value.items())
+    if isinstance(value, list):
+        if not value:
+            return "N/A"
+        separator = "\n" if any(isinstance(item, dict) for item in value) else ", "
+        return separator.join(format_value(item) for item in value)
+    return str(value)
+
+def write_csv(header, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+def write_xlsx(header, rows):
+    if not xlsxwriter:
+        raise ImportError("xlsxwriter is not installed. Please install it with 'pip install xlsxwriter'")
+
+    buffer = io.BytesIO()
+    workbook = xlsxwriter.Workbook(buffer, {"in_memory": True})
+    worksheet = workbook.add_worksheet("Extracted Data")
+    wrap = workbook.add_format({"text_wrap": True, "valign": "top"})
+    worksheet.write_row(0, 0, header, workbook.add_format({"bold": True}))
+    for i, row in enumerate(rows, start=1):
+        worksheet.write_row(i, 0, row, wrap)
+    # The last two columns hold the display name and the extracted value
+    worksheet.set_column(len(header) - 2, len(header) - 2, 30)
+    worksheet.set_column(len(header) - 1, len(header) - 1, 100)
+    workbook.close()
+    return buffer.getvalue()
+
+class ExtractionResult:
+    """
+    Information extracted from one agreement.
+
+    Holds one attribute per entry in FIELDS, plus the LLM token usage and, when the
+    extraction failed, the error and the raw model response.
+    """
+
+    __slots__ = FIELD_NAMES + ("token_usage", "error", "raw_response")
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            setattr(self, name, values.pop(name, None))
+        if values:
+            raise TypeError(f"Unknown extraction fields: {', '.join(values)}")
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Builds a result from a dictionary keyed by field name or display name.
+        Unknown keys are ignored.
+        """
+        result = cls()
+        for key, display_name in FIELDS:
+            if key in data:
+                setattr(result, key, data[key])
+            elif display_name in data:
+                setattr(result, key, data[display_name])
+        return result
+
+    @classmethod
+    def from_json(cls, text):
+        return cls.from_dict(json.loads(text))
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in FIELD_NAMES}
+
+    def to_display_dict(self):
+        return {display_name: getattr(self, key) for key, display_name in FIELDS}
+
+    def to_json(self, indent=2):
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def rows(self):
+        """
+        Returns (display_name, formatted_value) pairs for every field.
+        """
+        return [(display_name, format_value(getattr(self, key))) for key, display_name in FIELDS]
+
+    def numbered_rows(self):
+        return [(i, name, value) for i, (name, value) in enumerate(self.rows(), start=1)]
+
+    def to_csv(self, header=CSV_HEADER):
+        """
+        Serializes the result as CSV with a serial number, display name and value per field.
+        """
+        return write_csv(header, self.numbered_rows())
+
+    def to_xlsx(self, header=CSV_HEADER):
+        """
+        Serializes the result as an Excel workbook and returns its bytes.
+        """
+        return write_xlsx(header, self.numbered_rows())
+
+    def __eq__(self, other):
+        if not isinstance(other, ExtractionResult):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return f"ExtractionResult({', '.join(f'{key}={getattr(self, key)!r}' for key in FIELD_NAMES)})"
+
+COMBINED_HEADER = ("File",) + CSV_HEADER
+
+def combined_rows(named_results):
+    """
+    Returns one row per field of every (name, ExtractionResult) pair, prefixed with the name.
+    """
+    return [(name,) + row for name, result in named_results for row in result.numbered_rows()]
+
+def results_to_json(named_results):
+    return json.dumps({name: result.to_dict() for name, result in named_results}, indent=2)
+
+def results_to_csv(named_results):
+    return write_csv(COMBINED_HEADER, combined_rows(named_results))
+
+def results_to_xlsx(named_results):
+    return write_xlsx(COMBINED_HEADER, combined_rows(named_results))
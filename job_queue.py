@@ -0,0 +1,117 @@
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import ANALYSIS_MAX_WORKERS
+
+class AnalysisJob:
+    """
+    One file submitted to an AnalysisQueue, with its status, timings and result.
+    """
+
+    __slots__ = ("job_id", "filename", "file_path", "username", "status", "submitted_at", "started_at",
+                 "finished_at", "document_text", "result", "error", "logged", "future")
+
+    def __init__(self, filename, file_path, username=None):
+        self.job_id = uuid.uuid4().hex
+        self.filename = filename
+        self.file_path = file_path
+        # The user who submitted the file, whose token log the job is recorded in
+        self.username = username
+        self.status = "queued"
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.document_text = None
+        self.result = None
+        self.error = None
+        # Set once the caller has recorded the token usage of a finished job
+        self.logged = False
+        self.future = None
+
+    @property
+    def done(self):
+        return self.status in ("done", "failed")
+
+    def progress_row(self):
+        """
+        Returns the job as a row for a progress table.
+        """
+        now = time.time()
+        waited = (self.started_at or now) - self.submitted_at
+        processing = (self.finished_at or now) - self.started_at if self.started_at else 0.0
+        token_usage = (self.result.token_usage if self.result else None) or {}
+        return {
+            "File": self.filename,
+            "Status": self.status,
+            "Queued (s)": round(waited, 1),
+            "Processing (s)": round(processing, 1),
+            "Input Tokens": token_usage.get("input_tokens"),
+            "Output Tokens": token_usage.get("output_tokens"),
+            "Total Tokens": token_usage.get("total_tokens"),
+            "Error": self.error,
+        }
+
+class AnalysisQueue:
+    """
+    Runs document analyses in the background on a bounded pool of worker threads.
+
+    `analyze` is called as analyze(file_path) in a worker thread and must return
+    (document_text, extraction_result); it must not touch Streamlit.
+    Several queues can share one `executor` (the web app keeps one per server process, so that
+    the number of analyses running at once is bounded across sessions); otherwise the queue
+    creates its own with `max_workers` threads.
+    """
+
+    def __init__(self, analyze, max_workers=ANALYSIS_MAX_WORKERS, executor=None):
+        self.analyze = analyze
+        self.owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis")
+        self.jobs = []
+        self.lock = threading.Lock()
+
+    def submit(self, filename, file_path, username=None):
+        job = AnalysisJob(filename, file_path, username)
+        with self.lock:
+            self.jobs.append(job)
+        job.future = self.executor.submit(self._run, job)
+        return job
+
+    def _run(self, job):
+        job.started_at = time.time()
+        job.status = "running"
+        try:
+            job.document_text, job.result = self.analyze(job.file_path)
+            job.status = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.jobs)
+
+    def pending(self):
+        return any(not job.done for job in self.snapshot())
+
+    def clear(self):
+        """
+        Forgets all finished jobs.
+        """
+        with self.lock:
+            self.jobs = [job for job in self.jobs if not job.done]
+
+    def shutdown(self):
+        """
+        Cancels the jobs that have not started yet; running jobs finish in the background.
+        A shared executor is left running for the other queues.
+        """
+        for job in self.snapshot():
+            if job.future.cancel():
+                job.error = "Cancelled"
+                job.status = "failed"
+        if self.owns_executor:
+            self.executor.shutdown(wait=False)
@@ -0,0 +1,133 @@
+import json
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+
+
+class IncrementalJSONParser:
+    """
+    Parses a JSON object that arrives in chunks (e.g. a streamed LLM response)
+    and emits each top-level field as soon as its value is complete.
+
+    Elements of the list fields named in `item_fields` are also emitted one by one
+    while the list is still being generated.
+
+    Events are tuples:
+        ("item", field, value)   - one complete element of a streamed list field
+        ("field", field, value)  - a complete top-level field
+    """
+
+    def __init__(self, item_fields=("risky_clauses",)):
+        self.item_fields = set(item_fields)
+        self.buffer = ""
+        self.pos = 0
+        self.state = "start"
+        self.current_key = None
+        self.current_items = []
+        self.fields = {}
+
+    def feed(self, chunk):
+        """
+        Adds a chunk of text and returns the list of events it completed.
+        """
+        self.buffer += chunk
+        events = []
+        while self._step(events):
+            pass
+        # Drop the consumed prefix so the buffer only holds the value in progress
+        if self.pos:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        return events
+
+    def _skip(self, chars):
+        while self.pos < len(self.buffer) and self.buffer[self.pos] in chars:
+            self.pos += 1
+        return self.pos < len(self.buffer)
+
+    def _decode(self, delimiters=",}]"):
+        """
+        Decodes one JSON value at the current position. Returns (ok, value); the value
+        only counts as complete once one of `delimiters` has arrived after it, so that
+        partial numbers and literals (e.g. "12" of "12.5") are never emitted early.
+        """
+        try:
+            value, end = _decoder.raw_decode(self.buffer, self.pos)
+        except json.JSONDecodeError:
+            return False, None
+        delimiter = end
+        while delimiter < len(self.buffer) and self.buffer[delimiter] in _WHITESPACE:
+            delimiter += 1
+        if delimiter >= len(self.buffer) or self.buffer[delimiter] not in delimiters:
+            return False, None
+        self.pos = end
+        return True, value
+
+    def _step(self, events):
+        if self.state == "start":
+            # Skip anything before the object, e.g. a ```json markdown fence
+            brace = self.buffer.find("{", self.pos)
+            if brace == -1:
+                self.pos = len(self.buffer)
+                return False
+            self.pos = brace + 1
+            self.state = "key"
+            return True
+
+        if self.state == "key":
+            if not self._skip(_WHITESPACE + ","):
+                return False
+            if self.buffer[self.pos] == "}":
+                self.pos += 1
+                self.state = "done"
+                return False
+            ok, key = self._decode(delimiters=":")
+            if not ok:
+                return False
+            self.current_key = key
+            self.state = "colon"
+            return True
+
+        if self.state == "colon":
+            if not self._skip(_WHITESPACE + ":"):
+                return False
+            if self.current_key in self.item_fields and self.buffer[self.pos] == "[":
+                self.pos += 1
+                self.current_items = []
+                self.state = "item"
+            else:
+                self.state = "value"
+            return True
+
+        if self.state == "value":
+            ok, value = self._decode()
+            if not ok:
+                return False
+            self._complete_field(events, value)
+            return True
+
+        if self.state == "item":
+            if not self._skip(_WHITESPACE + ","):
+                return False
+            if self.buffer[self.pos] == "]":
+                self.pos += 1
+                self._complete_field(events, self.current_items)
+                return True
+            ok, item = self._decode()
+            if not ok:
+                return False
+            self.current_items.append(item)
+            events.append(("item", self.current_key, item))
+            return True
+
+        return False
+
+    def _complete_field(self, events, value):
+        self.fields[self.current_key] = value
+        events.append(("field", self.current_key, value))
+        self.current_key = None
+        self.state = "key"
+
+    @property
+    def done(self):
+        return self.state == "done"
@@ -0,0 +1,260 @@
+import os
+import re
+import json
+import time
+import random
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+
+from config import PATTERNS, LLM_BACKEND, GEMINI_MODEL, FAKE_LLM_PROFILE, FAKE_LLM_PROFILES
+from processors.text_processor import process_text
+
+try:
+    import google.generativeai as genai
+    from google.api_core import exceptions as google_exceptions
+except ImportError:
+    genai = None
+
+# Rough size of a Gemini token, used by the fake backend to report token usage
+CHARS_PER_TOKEN = 4
+
+class LLMError(Exception):
+    """
+    Raised when the LLM request fails.
+    """
+
+class RateLimitError(LLMError):
+    """
+    Raised when the LLM rejects a request because the rate limit was exceeded.
+    """
+
+class StreamedResponse:
+    """
+    The text chunks of a streamed generation.
+    token_usage is set once all chunks have been read.
+    """
+
+    def __init__(self, chunks):
+        # A generator that yields text chunks and returns the token usage
+        self.chunks = chunks
+        self.token_usage = None
+
+    def __iter__(self):
+        self.token_usage = yield from self.chunks
+
+class LLMBackend(ABC):
+    """
+    Interface of the language model used for analysis.
+
+    generate(prompt) returns (response_text, token_usage), generate_stream(prompt)
+    returns a StreamedResponse and count_tokens(text) returns the number of input tokens.
+    Token usage is a dict with input_tokens, output_tokens and total_tokens.
+    Failed requests raise LLMError, or RateLimitError when the rate limit was hit.
+    A subclass that does not implement all three methods cannot be instantiated.
+    """
+
+    name = None
+
+    @abstractmethod
+    def generate(self, prompt):
+        """
+        Returns (response_text, token_usage) for the prompt.
+        """
+
+    @abstractmethod
+    def generate_stream(self, prompt):
+        """
+        Returns a StreamedResponse for the prompt.
+        """
+
+    @abstractmethod
+    def count_tokens(self, text):
+        """
+        Returns the number of input tokens of the text.
+        """
+
+class GeminiBackend(LLMBackend):
+    """
+    Google Gemini through google-generativeai.
+    """
+
+    name = "gemini"
+
+    def __init__(self, api_key, model_name=GEMINI_MODEL):
+        if not genai:
+            raise ImportError("google-generativeai is not installed. Please install it with 'pip install google-generativeai'")
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY is not set.")
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name)
+
+    @staticmethod
+    def _token_usage(response):
+        return {
+            "input_tokens": response.usage_metadata.prompt_token_count,
+            "output_tokens": response.usage_metadata.candidates_token_count,
+            "total_tokens": response.usage_metadata.total_token_count
+        }
+
+    def generate(self, prompt):
+        try:
+            response = self.model.generate_content(prompt)
+            return response.text, self._token_usage(response)
+        except google_exceptions.ResourceExhausted as e:
+            raise RateLimitError(str(e)) from e
+        except google_exceptions.GoogleAPICallError as e:
+            raise LLMError(str(e)) from e
+
+    def _stream(self, prompt):
+        try:
+            response = self.model.generate_content(prompt, stream=True)
+            for chunk in response:
+                yield chunk.text
+            return self._token_usage(response)
+        except google_exceptions.ResourceExhausted as e:
+            raise RateLimitError(str(e)) from e
+        except google_exceptions.GoogleAPICallError as e:
+            raise LLMError(str(e)) from e
+
+    def generate_stream(self, prompt):
+        return StreamedResponse(self._stream(prompt))
+
+    def count_tokens(self, text):
+        try:
+            return self.model.count_tokens(text).total_tokens
+        except google_exceptions.GoogleAPICallError as e:
+            raise LLMError(str(e)) from e
+
+def fake_extraction(prompt):
+    """
+    Builds a schema-valid extraction for the agreement text in the prompt with the regex patterns.
+    """
+    text = prompt.split("Agreement text:", 1)[-1]
+    extraction = process_text(text).to_dict()
+    parties = extraction["parties"] or []
+    extraction["parties"] = parties
+    extraction["vendor"] = parties[0] if parties else None
+    extraction["receiver"] = parties[1] if len(parties) > 1 else None
+
+    risky_clauses = []
+    for sentence in re.split(r"(?<=[.!?])\s+", " ".join(text.split())):
+        if re.search(PATTERNS["risky_clauses"], sentence, re.IGNORECASE) and sentence not in risky_clauses:
+            risky_clauses.append(sentence)
+    extraction["risky_clauses"] = [
+        {"clause_text": sentence, "explanation": "This clause allocates liability or risk between the parties."}
+        for sentence in risky_clauses[:10]
+    ]
+    return extraction
+
+class FakeBackend(LLMBackend):
+    """
+    Local stand-in for Gemini that needs no API key or network access.
+
+    Responses are schema-valid JSON built with the regex extractor, and token usage is
+    estimated from the prompt and response length. The profile sets the latency before the
+    first token (seconds, +/- jitter as a fraction), the output speed in tokens per second
+    (0 for no delay), the share of requests that fail or return malformed JSON, and a
+    rate limit in requests per minute (0 for none), counted per backend instance.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency=0.0, jitter=0.0, tokens_per_second=0, error_rate=0.0,
+                 malformed_rate=0.0, rate_limit=0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.rate_limit = rate_limit
+        self.random = random.Random(seed)
+        self.request_times = deque()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_profile(cls, profile):
+        if profile not in FAKE_LLM_PROFILES:
+            raise ValueError(f"Unknown fake LLM profile: {profile}. Choose one of: {', '.join(FAKE_LLM_PROFILES)}")
+        return cls(**FAKE_LLM_PROFILES[profile])
+
+    def count_tokens(self, text):
+        return max(1, round(len(text) / CHARS_PER_TOKEN))
+
+    def _start_request(self):
+        """
+        Applies the rate limit and the error profile, then waits for the first token.
+        """
+        if self.rate_limit:
+            with self.lock:
+                now = time.monotonic()
+                while self.request_times and now - self.request_times[0] >= 60:
+                    self.request_times.popleft()
+                if len(self.request_times) >= self.rate_limit:
+                    raise RateLimitError(f"429 Resource has been exhausted (limit {self.rate_limit} requests per minute).")
+                self.request_times.append(now)
+        if self.latency:
+            time.sleep(self.latency * self.random.uniform(1 - self.jitter, 1 + self.jitter))
+        if self.random.random() < self.error_rate:
+            raise LLMError("500 An internal error has occurred.")
+
+    def _response_text(self, prompt):
+        text = "```json\n" + json.dumps(fake_extraction(prompt), indent=2) + "\n```"
+        if self.random.random() < self.malformed_rate:
+            # A response cut off mid-way, as when the output token limit is reached
+            text = text[:len(text) // 2]
+        return text
+
+    def _token_usage(self, prompt, text):
+        input_tokens = self.count_tokens(prompt)
+        output_tokens = self.count_tokens(text)
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+    def generate(self, prompt):
+        self._start_request()
+        text = self._response_text(prompt)
+        if self.tokens_per_second:
+            time.sleep(self.count_tokens(text) / self.tokens_per_second)
+        return text, self._token_usage(prompt, text)
+
+    def _stream(self, prompt):
+        self._start_request()
+        text = self._response_text(prompt)
+        chunk_size = 25 * CHARS_PER_TOKEN
+        for start in range(0, len(text), chunk_size):
+            chunk = text[start:start + chunk_size]
+            if self.tokens_per_second:
+                time.sleep(self.count_tokens(chunk) / self.tokens_per_second)
+            yield chunk
+        return self._token_usage(prompt, text)
+
+    def generate_stream(self, prompt):
+        return StreamedResponse(self._stream(prompt))
+
+BACKENDS = ("gemini", "fake")
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+def get_backend_name(name=None):
+    """
+    Returns the backend to use: `name` if given, else the LLM_BACKEND environment variable,
+    else the default from config.
+    """
+    name = name or os.getenv("LLM_BACKEND") or LLM_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend: {name}. Choose one of: {', '.join(BACKENDS)}")
+    return name
+
+def get_backend(api_key=None, name=None):
+    """
+    Returns the LLM backend selected by get_backend_name. The fake backend uses the profile
+    named by the FAKE_LLM_PROFILE environment variable.
+    Backends are shared within the process, so that the fake rate limit applies across threads.
+    """
+    name = get_backend_name(name)
+    key = (name, api_key if name == "gemini" else os.getenv("FAKE_LLM_PROFILE") or FAKE_LLM_PROFILE)
+    with _backends_lock:
+        if key not in _backends:
+            _backends[key] = GeminiBackend(api_key) if name == "gemini" else FakeBackend.from_profile(key[1])
+        return _backends[key]
@@ -1,4 +1,5 @@
 import os
+import sys
 import json
 import argparse
 
@@ -6,11 +7,21 @@ from processors.text_processor import process_text
 from processors.pdf_processor import process_pdf
 from processors.word_processor import process_word
 from processors.image_processor import process_image
+from processors.large_text_processor import is_large_text_file, process_large_text_file
 from ai_analyzer import analyze_text_with_llm
+from llm_backend import get_backend, LLMError, BACKENDS
+from extraction_result import ExtractionResult
+from near_duplicate import NearDuplicateIndex, extract_with_reuse, SIMILARITY_THRESHOLD
+from version_diff import reanalyze_changed_sections
+from search_index import SearchIndex
+from entity_index import EntityIndex
+from clause_classifier import ClauseClassifier
+from utils import document_key, file_document_key
 
-def get_file_processor(file_path):
+def get_file_processor(file_path, tesseract_cmd=None):
     """
     Determines the appropriate processor based on the file extension.
+    OCR uses the Tesseract on the system PATH unless tesseract_cmd is given.
     """
     _, ext = os.path.splitext(file_path)
     ext = ext.lower()
@@ -19,14 +30,36 @@ def get_file_processor(file_path):
         with open(file_path, 'r') as f:
             return f.read()
     elif ext == '.pdf':
-        return process_pdf(file_path)
+        return process_pdf(file_path, tesseract_cmd=tesseract_cmd)
     elif ext == '.docx':
         return process_word(file_path)
     elif ext in ['.png', '.jpg', '.jpeg', '.tiff']:
-        return process_image(file_path) # This will use the system PATH
+        return process_image(file_path, tesseract_cmd=tesseract_cmd)
     else:
         raise ValueError(f"Unsupported file type: {ext}")
 
+def extract_fields(text, use_llm, backend=None):
+    """
+    Extracts the agreement fields from the text as an ExtractionResult, using the LLM or the regex patterns.
+    """
+    if use_llm:
+        result = analyze_text_with_llm(text, os.getenv("GEMINI_API_KEY"), backend=backend)
+        if result.error:
+            raise ValueError(f"{result.error}: {result.raw_response}")
+        return result
+    return process_text(text)
+
+def analyze_document(file_path, api_key, tesseract_cmd=None, backend=None):
+    """
+    Extracts the text of a document and analyzes it with the LLM.
+    Returns (document_text, ExtractionResult); raises ValueError if the LLM response could not be parsed.
+    """
+    text = get_file_processor(file_path, tesseract_cmd=tesseract_cmd)
+    result = analyze_text_with_llm(text, api_key, backend=backend)
+    if result.error:
+        raise ValueError(f"{result.error}: {result.raw_response}")
+    return text, result
+
 def main():
     """
     Main function to run the enhanced extraction script.
@@ -34,22 +67,79 @@ def main():
     parser = argparse.ArgumentParser(description="Extract structured information from a legal agreement.")
     parser.add_argument("file_path", help="Path to the agreement file.")
     parser.add_argument("--use_llm", action="store_true", help="Use LLM for analysis.")
+    parser.add_argument("--backend", choices=BACKENDS, help="LLM backend; defaults to the LLM_BACKEND environment variable or gemini.")
+    parser.add_argument("--dedup_index", help="Path to a near-duplicate index used to reuse extractions of similar agreements.")
+    parser.add_argument("--similarity_threshold", type=float, default=SIMILARITY_THRESHOLD, help="Minimum similarity for reusing a previous extraction.")
+    parser.add_argument("--previous_version", help="Path to the previous version of the agreement; only changed sections are re-analyzed.")
+    parser.add_argument("--previous_result", help="Path to the JSON extraction of the previous version (extracted again if omitted).")
+    parser.add_argument("--search_index", help="Path to the search index to add the processed agreement to.")
+    parser.add_argument("--document_id", help="Stable ID of the agreement in the indexes; defaults to a hash of its text, "
+                                              "so that different files with the same name are kept apart.")
+    parser.add_argument("--entity_index", help="Path to the party index to add the parties of the processed agreement to.")
+    parser.add_argument("--triage_model", help="Path to a trained clause classifier; with --use_llm, the LLM is only called for agreements it flags.")
     args = parser.parse_args()
 
     try:
+        if not (args.use_llm or args.previous_version or args.dedup_index or args.search_index) and is_large_text_file(args.file_path):
+            # Very large plain-text files are scanned in chunks instead of being read into memory;
+            # the party index only needs the extraction
+            result = process_large_text_file(args.file_path)
+            print(result.to_json())
+            if args.entity_index:
+                key = args.document_id or file_document_key(args.file_path)
+                EntityIndex(args.entity_index).add_document(os.path.basename(args.file_path), result.to_dict(), key=key)
+            return
+
         text = get_file_processor(args.file_path)
+        use_llm = args.use_llm
+        if use_llm and args.triage_model:
+            triage = ClauseClassifier.load(args.triage_model).triage(text)
+            if not triage["needs_llm_review"]:
+                print(f"No risky sections found by triage (scores {triage['scores']}); "
+                      f"using pattern extraction instead of the LLM.", file=sys.stderr)
+                use_llm = False
+        backend = get_backend(os.getenv("GEMINI_API_KEY"), args.backend) if use_llm else None
+        extract_section_fields = lambda section_text: extract_fields(section_text, use_llm, backend).to_dict()
+        key = args.document_id or document_key(text)
         
-        if args.use_llm:
-            api_key = os.getenv("GEMINI_API_KEY")
-            if not api_key:
-                raise ValueError("GEMINI_API_KEY environment variable not set.")
-            extracted_data = analyze_text_with_llm(text, api_key)
+        if args.previous_version:
+            previous_text = get_file_processor(args.previous_version)
+            if args.previous_result:
+                with open(args.previous_result, 'r', encoding='utf-8') as f:
+                    previous_extraction = ExtractionResult.from_dict(json.load(f)).to_dict()
+            else:
+                previous_extraction = extract_fields(previous_text, use_llm, backend).to_dict()
+            merged, changes = reanalyze_changed_sections(previous_text, previous_extraction, text, extract_section_fields)
+            result = ExtractionResult.from_dict(merged)
+            print(json.dumps({"result": result.to_dict(), "changes": changes}, indent=2))
+        elif args.dedup_index:
+            index = NearDuplicateIndex(args.dedup_index)
+            extraction, report = extract_with_reuse(
+                text,
+                os.path.basename(args.file_path),
+                extract_section_fields,
+                index,
+                threshold=args.similarity_threshold,
+                key=key
+            )
+            if report["reused_from"]:
+                print(f"Reused extraction from {report['reused_from']} (similarity {report['similarity']}), "
+                      f"re-extracted {len(report['changed_sections'])} changed section(s), "
+                      f"{len(report['removed_sections'])} section(s) removed.", file=sys.stderr)
+            result = ExtractionResult.from_dict(extraction)
+            print(result.to_json())
         else:
-            extracted_data = process_text(text)
-        
-        print(json.dumps(extracted_data, indent=2))
+            result = extract_fields(text, use_llm, backend)
+            print(result.to_json())
+
+        if args.search_index:
+            SearchIndex(args.search_index).add_document(
+                os.path.basename(args.file_path), text, result.to_dict(), source="llm" if use_llm else "regex", key=key
+            )
+        if args.entity_index:
+            EntityIndex(args.entity_index).add_document(os.path.basename(args.file_path), result.to_dict(), key=key)
 
-    except (FileNotFoundError, ValueError, ImportError) as e:
+    except (FileNotFoundError, ValueError, ImportError, LLMError) as e:
         print(f"Error: {e}")
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
@@ -0,0 +1,230 @@
+import re
+import json
+import random
+import hashlib
+import sqlite3
+import threading
+import zlib
+from array import array
+from datetime import datetime
+
+from utils import split_sections, section_keys, extraction_sources, merge_extraction, document_key
+
+NEAR_DUPLICATE_INDEX_FILE = "near_duplicates.db"
+SHINGLE_SIZE = 5
+NUM_PERMUTATIONS = 128
+NUM_BANDS = 32
+SIMILARITY_THRESHOLD = 0.8
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+# Fixed seed so that signatures stay comparable across runs and with the persisted index
+_rng = random.Random(1)
+PERMUTATIONS = [
+    (_rng.randint(1, MERSENNE_PRIME - 1), _rng.randint(0, MERSENNE_PRIME - 1))
+    for _ in range(NUM_PERMUTATIONS)
+]
+
+def shingle(text, size=SHINGLE_SIZE):
+    """
+    Returns the set of hashed word shingles of the text.
+    Numbers are masked so that templated agreements differing only in amounts and dates still match.
+    """
+    words = re.findall(r"\w+", re.sub(r"\d+", "#", text.lower()))
+    if len(words) < size:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))} if words else set()
+    return {
+        zlib.crc32(" ".join(words[i:i + size]).encode("utf-8"))
+        for i in range(len(words) - size + 1)
+    }
+
+def minhash_signature(shingles):
+    """
+    Computes the MinHash signature of a set of hashed shingles.
+    """
+    if not shingles:
+        return [MAX_HASH] * NUM_PERMUTATIONS
+    return [
+        min((a * h + b) % MERSENNE_PRIME for h in shingles) & MAX_HASH
+        for a, b in PERMUTATIONS
+    ]
+
+def estimate_similarity(signature_a, signature_b):
+    """
+    Estimates the Jaccard similarity of two documents from their MinHash signatures.
+    """
+    matches = sum(1 for a, b in zip(signature_a, signature_b) if a == b)
+    return matches / len(signature_a)
+
+def section_hashes(text):
+    """
+    Maps each numbered section of the text to a hash of its content.
+    """
+    sections = split_sections(text)
+    return {
+        key: hashlib.sha1(" ".join(section_text.split()).encode("utf-8")).hexdigest()
+        for key, (_, _, section_text) in zip(section_keys(sections), sections)
+    }
+
+class NearDuplicateIndex:
+    """
+    MinHash/LSH index over previously processed agreements and their extractions, stored in SQLite.
+
+    Each document's signature is split into NUM_BANDS bands, and every band is stored as an
+    indexed bucket row, so a query only reads the documents sharing a bucket with it; the
+    extraction of a document is only loaded once it has been matched. Documents are identified
+    by a key (a hash of their text unless the caller supplies a stable ID), and adding a
+    document again replaces its entry.
+    """
+
+    def __init__(self, db_path=NEAR_DUPLICATE_INDEX_FILE):
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.RLock()
+        self.rows_per_band = NUM_PERMUTATIONS // NUM_BANDS
+        try:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    doc_id INTEGER PRIMARY KEY,
+                    key TEXT UNIQUE NOT NULL,
+                    name TEXT NOT NULL,
+                    added_at TEXT NOT NULL,
+                    signature BLOB NOT NULL,
+                    sections TEXT NOT NULL,
+                    extraction TEXT NOT NULL,
+                    sources TEXT
+                );
+                CREATE TABLE IF NOT EXISTS buckets (
+                    band INTEGER NOT NULL,
+                    bucket BLOB NOT NULL,
+                    doc_id INTEGER NOT NULL,
+                    PRIMARY KEY (band, bucket, doc_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS buckets_by_doc ON buckets (doc_id);
+            """)
+        except sqlite3.DatabaseError:
+            self.conn.close()
+            # Indexes used to be JSON Lines files
+            raise ValueError(f"{db_path} is not a near-duplicate index database; "
+                             f"use a new path to build the index in SQLite.")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def _band_keys(self, signature):
+        for band in range(NUM_BANDS):
+            start = band * self.rows_per_band
+            yield band, array("I", signature[start:start + self.rows_per_band]).tobytes()
+
+    def add(self, name, text, extraction, key=None):
+        """
+        Adds (or replaces) a processed document under `key` (by default document_key(text)),
+        with `name` as its display name. Returns the key.
+        """
+        key = key or document_key(text)
+        signature = minhash_signature(shingle(text))
+        row = (
+            name, datetime.now().isoformat(), array("I", signature).tobytes(),
+            json.dumps(section_hashes(text)), json.dumps(extraction),
+            # The sections each extracted value came from, so that reuse can tell which values a change affects
+            json.dumps(extraction_sources(extraction, text))
+        )
+        with self.lock, self.conn:
+            existing = self.conn.execute("SELECT doc_id FROM documents WHERE key = ?", (key,)).fetchone()
+            if existing:
+                doc_id = existing[0]
+                self.conn.execute("DELETE FROM buckets WHERE doc_id = ?", (doc_id,))
+                self.conn.execute(
+                    "UPDATE documents SET name = ?, added_at = ?, signature = ?, sections = ?, extraction = ?, "
+                    "sources = ? WHERE doc_id = ?", row + (doc_id,)
+                )
+            else:
+                doc_id = self.conn.execute(
+                    "INSERT INTO documents (key, name, added_at, signature, sections, extraction, sources) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", (key,) + row
+                ).lastrowid
+            self.conn.executemany(
+                "INSERT INTO buckets (band, bucket, doc_id) VALUES (?, ?, ?)",
+                [(band, bucket, doc_id) for band, bucket in self._band_keys(signature)]
+            )
+        return key
+
+    def query(self, text, exclude=None):
+        """
+        Finds the most similar indexed document, other than the one with key `exclude`.
+        Returns (key, estimated_similarity), or (None, 0.0) if no candidate shares an LSH band.
+        """
+        signature = minhash_signature(shingle(text))
+        best_key, best_similarity = None, 0.0
+        with self.lock:
+            candidates = set()
+            for band, bucket in self._band_keys(signature):
+                candidates.update(doc_id for doc_id, in self.conn.execute(
+                    "SELECT doc_id FROM buckets WHERE band = ? AND bucket = ?", (band, bucket)
+                ))
+            for doc_id in candidates:
+                key, stored = self.conn.execute(
+                    "SELECT key, signature FROM documents WHERE doc_id = ?", (doc_id,)
+                ).fetchone()
+                if key == exclude:
+                    continue
+                similarity = estimate_similarity(signature, array("I", stored))
+                if similarity > best_similarity:
+                    best_key, best_similarity = key, similarity
+        return best_key, best_similarity
+
+    def get(self, key):
+        """
+        Returns the stored entry of a document as a dict with its name, section hashes,
+        extraction and value sources, or None if the key is not indexed.
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT name, sections, extraction, sources FROM documents WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        name, sections, extraction, sources = row
+        return {"name": name, "sections": json.loads(sections), "extraction": json.loads(extraction),
+                "sources": json.loads(sources) if sources else None}
+
+def extract_with_reuse(text, name, extractor, index, threshold=SIMILARITY_THRESHOLD, key=None):
+    """
+    Extracts information from the text, reusing the extraction of the closest previously
+    processed document when it is similar enough.
+
+    Only the sections that differ from the matched document are passed to `extractor`
+    (a function from text to a dict of extracted fields). Values of the matched document
+    whose source sections were changed or removed are replaced by, or dropped in favour of,
+    the re-extracted ones (see utils.merge_extraction). The document is then added to the
+    index under `key` (by default document_key(text)). Returns (extraction, report).
+    """
+    key = key or document_key(text)
+    match_key, similarity = index.query(text, exclude=key)
+    report = {"reused_from": None, "similarity": round(similarity, 3), "changed_sections": None, "removed_sections": None}
+
+    if match_key is not None and similarity >= threshold:
+        previous = index.get(match_key)
+        hashes = section_hashes(text)
+        changed = [section for section, digest in hashes.items() if previous["sections"].get(section) != digest]
+        removed = [section for section in previous["sections"] if section not in hashes]
+        report["reused_from"] = previous["name"]
+        report["changed_sections"] = changed
+        report["removed_sections"] = removed
+
+        if changed or removed:
+            sections = dict(zip(hashes, (section_text for _, _, section_text in split_sections(text))))
+            changed_text = "\n".join(sections[section] for section in changed)
+            partial = extractor(changed_text) if changed_text else {}
+            stale = [section for section in previous["sections"] if section in removed or section in changed]
+            extraction = merge_extraction(
+                previous["extraction"], previous.get("sources"), partial, changed_text, text, stale
+            )
+        else:
+            extraction = dict(previous["extraction"])
+    else:
+        extraction = extractor(text)
+
+    index.add(name, text, extraction, key=key)
+    return extraction, report
@@ -5,9 +5,11 @@ except ImportError:
     Image = None
     pytesseract = None
 
-def process_image(file_path, tesseract_cmd=None):
+def ocr_image(image, tesseract_cmd=None, keep_lines=False):
     """
-    Processes an image file to extract text using OCR.
+    Extracts text from a PIL image using OCR.
+    With keep_lines, line breaks are kept (blank lines dropped) so that page layout such as
+    numbered section headings survives; otherwise the text is joined into one line.
     """
     if not Image or not pytesseract:
         raise ImportError("Pillow and pytesseract are not installed. Please install them with 'pip install Pillow pytesseract'")
@@ -16,7 +18,6 @@ def process_image(file_path, tesseract_cmd=None):
         pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
 
     try:
-        image = Image.open(file_path)
         # Convert to grayscale
         image = image.convert('L')
         # Increase contrast
@@ -24,6 +25,8 @@ def process_image(file_path, tesseract_cmd=None):
         image = enhancer.enhance(2)
         text = pytesseract.image_to_string(image)
         # Basic text cleaning
+        if keep_lines:
+            return '\n'.join(' '.join(line.split()) for line in text.splitlines() if line.strip())
         text = text.replace('\n', ' ').replace('\r', '')  # Remove newlines
         text = ' '.join(text.split())  # Remove extra whitespace
         return text
@@ -32,3 +35,12 @@ def process_image(file_path, tesseract_cmd=None):
             "Tesseract is not installed or it's not in your PATH."
             "See README file for more information."
         )
+
+def process_image(file_path, tesseract_cmd=None):
+    """
+    Processes an image file to extract text using OCR.
+    """
+    if not Image or not pytesseract:
+        raise ImportError("Pillow and pytesseract are not installed. Please install them with 'pip install Pillow pytesseract'")
+
+    return ocr_image(Image.open(file_path), tesseract_cmd=tesseract_cmd)
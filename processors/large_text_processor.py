@@ -0,0 +1,131 @@
+import os
+import re
+import mmap
+
+from config import PATTERNS, LARGE_TEXT_THRESHOLD, LARGE_TEXT_CHUNK_SIZE, LARGE_TEXT_OVERLAP
+from extraction_result import ExtractionResult
+from utils import format_date
+from processors.text_processor import process_text
+
+CLAUSE_TITLES = {
+    "termination_clause": "Termination",
+    "payment_terms": "Payment Terms",
+    "confidentiality_obligations": "Confidentiality",
+}
+
+def clause_pattern(title):
+    """
+    Byte version of the clause pattern used by utils.extract_clause.
+    """
+    return re.compile(
+        rb"(\d+\.\s+" + re.escape(title.encode("utf-8")) + rb"\s*\.\s*)(.*?)(?=\n\d+\.\s+|\Z)",
+        re.DOTALL | re.IGNORECASE
+    )
+
+# Start of the next numbered section, which ends a clause; the heading overlap covers its length
+NEXT_HEADING = re.compile(rb"\n\d+\.\s")
+HEADING_OVERLAP = 64
+
+def clause_end(mm, position, size, chunk_size):
+    """
+    Returns the offset of the first numbered section heading at or after position, or the
+    file size, scanning the map chunk by chunk so that clauses of any length are found whole.
+    """
+    while position < size:
+        window = mm[position:min(size, position + chunk_size + HEADING_OVERLAP)]
+        match = NEXT_HEADING.search(window)
+        if match:
+            return position + match.start()
+        position += chunk_size
+    return size
+
+def is_large_text_file(file_path):
+    """
+    Checks whether a file is a plain-text file that should be processed with process_large_text_file.
+    """
+    return file_path.lower().endswith(".txt") and os.path.getsize(file_path) > LARGE_TEXT_THRESHOLD
+
+def decode(data):
+    return data.decode("utf-8", errors="replace")
+
+def process_large_text_file(file_path, chunk_size=LARGE_TEXT_CHUNK_SIZE, overlap=LARGE_TEXT_OVERLAP):
+    """
+    Extracts agreement information from a plain-text file without reading it into memory.
+
+    The file is memory-mapped and scanned in windows of chunk_size + overlap bytes, so peak memory
+    stays bounded regardless of file size. Matches are assumed to be shorter than the overlap,
+    except clauses, which run to the next numbered section or the end of the file.
+    Returns the same fields as process_text.
+    """
+    size = os.path.getsize(file_path)
+    if size == 0:
+        return process_text("")
+
+    parties_pattern = re.compile(PATTERNS["parties"].encode("utf-8"), re.IGNORECASE)
+    effective_date_pattern = re.compile(PATTERNS["effective_date"].encode("utf-8"))
+    risky_pattern = re.compile(PATTERNS["risky_clauses"].encode("utf-8"), re.IGNORECASE)
+    clause_patterns = {field: clause_pattern(title) for field, title in CLAUSE_TITLES.items()}
+
+    parties_match = None
+    effective_date_match = None
+    clauses = {}
+    risky_clauses = []
+    # Risky clause matches repeat a lot; reuse one string per distinct match
+    risky_strings = {}
+
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for start in range(0, size, chunk_size):
+            end = min(size, start + chunk_size + overlap)
+            is_last = end == size
+            window = mm[start:end]
+
+            if parties_match is None:
+                parties_match = parties_pattern.search(window)
+            if effective_date_match is None:
+                effective_date_match = effective_date_pattern.search(window)
+
+            for field, pattern in clause_patterns.items():
+                if field in clauses:
+                    continue
+                match = pattern.search(window)
+                if match is None:
+                    continue
+                if match.end() == len(window) and not is_last:
+                    # The clause runs past the window; look for its end in the rest of the file
+                    body_start = start + match.start(2)
+                    clauses[field] = decode(mm[body_start:clause_end(mm, body_start, size, chunk_size)]).strip()
+                else:
+                    clauses[field] = decode(match.group(2)).strip()
+
+            # Matches starting in the overlap are counted by the next window
+            limit = len(window) if is_last else chunk_size
+            for match in risky_pattern.finditer(window):
+                if match.start() >= limit:
+                    break
+                value = match.group(0).strip()
+                if value not in risky_strings:
+                    risky_strings[value] = decode(value)
+                risky_clauses.append(risky_strings[value])
+
+            del window
+            if is_last:
+                break
+            # Release the pages scanned so far; they count towards RSS while mapped
+            if hasattr(mm, "madvise"):
+                mm.madvise(mmap.MADV_DONTNEED, 0, start + chunk_size - (start + chunk_size) % mmap.PAGESIZE)
+
+    cleaned_parties = []
+    if parties_match:
+        for party in decode(parties_match.group(1)).split(' and '):
+            cleaned_parties.append(party.strip())
+
+    effective_date = format_date(decode(effective_date_match.group(1))) if effective_date_match else None
+
+    return ExtractionResult(
+        parties=cleaned_parties if cleaned_parties else None,
+        effective_date=effective_date,
+        termination_clause=clauses.get("termination_clause"),
+        payment_terms=clauses.get("payment_terms"),
+        confidentiality_obligations=clauses.get("confidentiality_obligations"),
+        risky_clauses=risky_clauses if risky_clauses else None
+    )
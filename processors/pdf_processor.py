@@ -1,18 +1,125 @@
+import os
+import re
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from config import PDF_MIN_PAGE_CHARS, PDF_MIN_TEXT_QUALITY, PDF_OCR_DPI, PDF_OCR_MAX_WORKERS
+from processors.image_processor import ocr_image
+
 try:
     import PyPDF2
 except ImportError:
     PyPDF2 = None
 
-def process_pdf(file_path):
+try:
+    from pdf2image import convert_from_path
+    from pdf2image.exceptions import PDFInfoNotInstalledError, PDFPageCountError, PDFSyntaxError
+    PDF2IMAGE_ERRORS = (PDFInfoNotInstalledError, PDFPageCountError, PDFSyntaxError)
+except ImportError:
+    convert_from_path = None
+    PDF2IMAGE_ERRORS = ()
+
+# Process pool shared by every document, so that concurrent uploads do not each start one process per CPU
+_ocr_executor = None
+_ocr_executor_lock = threading.Lock()
+
+def _shared_ocr_executor():
+    global _ocr_executor
+    with _ocr_executor_lock:
+        if _ocr_executor is None:
+            _ocr_executor = ProcessPoolExecutor(max_workers=min(PDF_OCR_MAX_WORKERS, os.cpu_count() or 1))
+        return _ocr_executor
+
+def needs_ocr(text):
     """
-    Processes a PDF file to extract text.
+    Checks whether a page's text layer is missing or too garbled to use.
+    """
+    # Glyphs without a Unicode mapping come out as "(cid:NN)"
+    stripped = re.sub(r"\(cid:\d+\)", "\ufffd", text.strip())
+    if len(stripped) < PDF_MIN_PAGE_CHARS:
+        return True
+    readable = sum(1 for c in stripped if c.isalnum() or c.isspace() or c in ".,;:()'\"-$%/&")
+    return readable / len(stripped) < PDF_MIN_TEXT_QUALITY
+
+def ocr_pdf_page(file_path, page_number, tesseract_cmd=None):
+    """
+    Rasterizes one PDF page (1-based) and extracts its text using OCR.
+    Returns (text, seconds, error); if Poppler or Tesseract is unavailable, text is empty
+    and error describes the failure.
+    """
+    start = time.perf_counter()
+    try:
+        images = convert_from_path(file_path, dpi=PDF_OCR_DPI, first_page=page_number, last_page=page_number)
+        text = ocr_image(images[0], tesseract_cmd=tesseract_cmd, keep_lines=True)
+    except PDF2IMAGE_ERRORS + (ValueError, ImportError) as e:
+        return "", time.perf_counter() - start, str(e)
+    return text, time.perf_counter() - start, None
+
+def process_pdf_with_report(file_path, tesseract_cmd=None):
+    """
+    Processes a PDF file to extract text, sending only pages without a usable text layer through OCR.
+
+    OCR pages are rasterized and recognized in parallel on a process pool shared by all documents
+    (PDF_OCR_MAX_WORKERS processes) and merged back in page order, one line per page break.
+    Returns (text, report), where report has one dict per page with the method used
+    ("text" or "ocr"), the time taken and the number of characters extracted.
     """
     if not PyPDF2:
         raise ImportError("PyPDF2 is not installed. Please install it with 'pip install PyPDF2'")
-        
-    text = ""
+
+    page_texts = []
+    report = []
     with open(file_path, 'rb') as f:
         reader = PyPDF2.PdfReader(f)
-        for page in reader.pages:
-            text += page.extract_text()
+        for page_number, page in enumerate(reader.pages, start=1):
+            start = time.perf_counter()
+            text = page.extract_text() or ""
+            page_texts.append(text)
+            report.append({
+                "page": page_number,
+                "method": "ocr" if needs_ocr(text) else "text",
+                "seconds": time.perf_counter() - start,
+                "characters": len(text)
+            })
+
+    ocr_pages = [entry["page"] for entry in report if entry["method"] == "ocr"]
+    if ocr_pages and not convert_from_path:
+        # Keep whatever text layer there is rather than failing the whole document
+        for entry in report:
+            if entry["method"] == "ocr":
+                entry["method"] = "text"
+                entry["note"] = "OCR unavailable: install pdf2image and Poppler"
+        ocr_pages = []
+
+    if len(ocr_pages) == 1:
+        ocr_results = [ocr_pdf_page(file_path, ocr_pages[0], tesseract_cmd)]
+    elif ocr_pages:
+        ocr_results = list(_shared_ocr_executor().map(
+            ocr_pdf_page, [file_path] * len(ocr_pages), ocr_pages, [tesseract_cmd] * len(ocr_pages)
+        ))
+    else:
+        ocr_results = []
+
+    for page_number, (text, seconds, error) in zip(ocr_pages, ocr_results):
+        entry = report[page_number - 1]
+        entry["seconds"] += seconds
+        if error:
+            # A page that cannot be OCRed keeps its text layer rather than failing the whole document
+            entry["method"] = "text"
+            entry["note"] = f"OCR failed: {error}; kept the text layer"
+        elif text.strip():
+            page_texts[page_number - 1] = text
+            entry["characters"] = len(text)
+        else:
+            entry["note"] = "OCR found no text; kept the text layer"
+
+    # Pages do not always end with a line break, and a heading at the top of a page must start its own line
+    return "\n".join(page_texts), report
+
+def process_pdf(file_path, tesseract_cmd=None):
+    """
+    Processes a PDF file to extract text.
+    """
+    text, _ = process_pdf_with_report(file_path, tesseract_cmd=tesseract_cmd)
     return text
@@ -1,5 +1,6 @@
 import re
 from config import PATTERNS
+from extraction_result import ExtractionResult
 from utils import format_date, extract_clause
 
 def process_text(text):
@@ -25,11 +26,11 @@ def process_text(text):
     for clause in re.finditer(PATTERNS["risky_clauses"], text, re.IGNORECASE):
         risky_clauses.append(clause.group(0).strip())
 
-    return {
-        "parties": cleaned_parties if cleaned_parties else None,
-        "effective_date": effective_date,
-        "termination_clause": termination_clause,
-        "payment_terms": payment_terms,
-        "confidentiality_obligations": confidentiality_obligations,
-        "risky_clauses": risky_clauses if risky_clauses else None
-    }
+    return ExtractionResult(
+        parties=cleaned_parties if cleaned_parties else None,
+        effective_date=effective_date,
+        termination_clause=termination_clause,
+        payment_terms=payment_terms,
+        confidentiality_obligations=confidentiality_obligations,
+        risky_clauses=risky_clauses if risky_clauses else None
+    )
@@ -0,0 +1,483 @@
+import re
+import json
+import sqlite3
+import threading
+import argparse
+from array import array
+from datetime import datetime
+
+from utils import split_sections, document_key
+
+SEARCH_INDEX_FILE = "search_index.db"
+# Values of the source column: how a document's fields were extracted
+SOURCES = ("llm", "regex")
+
+# Candidate documents are looked up one by one when the posting list is this many times longer
+NARROW_LOOKUP_RATIO = 8
+POSITION_SIZE = array("I").itemsize
+
+def tokenize(text):
+    """
+    Splits text into lowercase word tokens.
+    """
+    return re.findall(r"\w+", text.lower())
+
+def parse_query(query):
+    """
+    Parses a search query into (field, words) parts.
+    Quoted text is a phrase, bare words are individual terms, and either can be
+    restricted to one extracted field with a "field:" prefix, e.g. risky_clauses:"unlimited indemnification".
+    """
+    parts = []
+    for field, phrase, word in re.findall(r'(?:(\w+):)?(?:"([^"]*)"|(\S+))', query):
+        words = tokenize(phrase if phrase else word)
+        if words:
+            if phrase:
+                parts.append((field or None, words))
+            else:
+                parts.extend((field or None, [w]) for w in words)
+    return parts
+
+def extraction_units(extraction):
+    """
+    Flattens an extraction into (field, section, text) units. Each list item becomes its own
+    section so that phrases never match across two items.
+    """
+    for field, value in extraction.items():
+        if value is None:
+            continue
+        if isinstance(value, list):
+            for i, item in enumerate(value, start=1):
+                if isinstance(item, dict):
+                    item = " ".join(str(v) for v in item.values() if v)
+                yield field, str(i), str(item)
+        else:
+            yield field, "", str(value)
+
+def section_sort_key(section):
+    """
+    Sort key for stored section labels: the preamble, then numbered sections, then the rest.
+    """
+    number = section.split(".", 1)[0]
+    return (0, int(number)) if number.isdigit() else (-1, 0) if number == "preamble" else (1, section)
+
+class SearchIndex:
+    """
+    Persistent positional inverted index over processed agreements, stored in SQLite.
+
+    Every document is indexed per field and section: the agreement text is stored under the
+    "text" field, one section per numbered clause, and each extracted field under its own name.
+    Postings keep the token positions so that phrase queries can be answered from the index.
+    The extraction itself is kept as JSON together with its source ("llm" or "regex").
+    Documents are identified by a key (a hash of their text unless the caller supplies a
+    stable ID), so that different agreements with the same file name are kept apart.
+
+    One index can be shared between threads (the web app keeps a single instance for all
+    sessions), so every use of the connection holds `lock`.
+    """
+
+    def __init__(self, db_path=SEARCH_INDEX_FILE):
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.RLock()
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_id INTEGER PRIMARY KEY,
+                key TEXT UNIQUE NOT NULL,
+                name TEXT NOT NULL,
+                indexed_at TEXT NOT NULL,
+                source TEXT,
+                extraction TEXT
+            );
+            CREATE TABLE IF NOT EXISTS units (
+                doc_id INTEGER NOT NULL,
+                field TEXT NOT NULL,
+                section TEXT NOT NULL,
+                content TEXT NOT NULL,
+                PRIMARY KEY (doc_id, field, section)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS terms (
+                term_id INTEGER PRIMARY KEY,
+                term TEXT UNIQUE NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                term_id INTEGER NOT NULL,
+                doc_id INTEGER NOT NULL,
+                field TEXT NOT NULL,
+                section TEXT NOT NULL,
+                positions BLOB NOT NULL,
+                PRIMARY KEY (term_id, doc_id, field, section)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_by_doc ON postings (doc_id);
+        """)
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(documents)")]
+        # Indexes created before the extraction was stored; their documents have no known source
+        for column in ("source", "extraction"):
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE documents ADD COLUMN {column} TEXT")
+        if "key" not in columns:
+            # Indexes created when documents were keyed by name; the name becomes their key
+            with self.conn:
+                self.conn.execute("ALTER TABLE documents RENAME TO documents_by_name")
+                self.conn.execute("""
+                    CREATE TABLE documents (
+                        doc_id INTEGER PRIMARY KEY,
+                        key TEXT UNIQUE NOT NULL,
+                        name TEXT NOT NULL,
+                        indexed_at TEXT NOT NULL,
+                        source TEXT,
+                        extraction TEXT
+                    )
+                """)
+                self.conn.execute("""
+                    INSERT INTO documents (doc_id, key, name, indexed_at, source, extraction)
+                    SELECT doc_id, name, name, indexed_at, source, extraction FROM documents_by_name
+                """)
+                self.conn.execute("DROP TABLE documents_by_name")
+        self.term_ids = dict((term, term_id) for term_id, term in self.conn.execute("SELECT term_id, term FROM terms"))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def _lookup_term(self, term):
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            # The term may have been added by another process since the index was opened
+            row = self.conn.execute("SELECT term_id FROM terms WHERE term = ?", (term,)).fetchone()
+            if row:
+                term_id = self.term_ids[term] = row[0]
+        return term_id
+
+    def _term_id(self, term):
+        term_id = self._lookup_term(term)
+        if term_id is None:
+            term_id = self.conn.execute("INSERT INTO terms (term) VALUES (?)", (term,)).lastrowid
+            self.term_ids[term] = term_id
+        return term_id
+
+    def _add(self, key, name, text, extraction, source):
+        if source is not None and source not in SOURCES:
+            raise ValueError(f"Unknown extraction source: {source}. Choose one of: {', '.join(SOURCES)}")
+        stored = json.dumps(extraction) if extraction is not None else None
+        row = self.conn.execute("SELECT doc_id FROM documents WHERE key = ?", (key,)).fetchone()
+        if row:
+            # Re-indexing a document replaces all of its postings
+            doc_id = row[0]
+            self.conn.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+            self.conn.execute("DELETE FROM units WHERE doc_id = ?", (doc_id,))
+            self.conn.execute(
+                "UPDATE documents SET name = ?, indexed_at = ?, source = ?, extraction = ? WHERE doc_id = ?",
+                (name, datetime.now().isoformat(), source, stored, doc_id)
+            )
+        else:
+            doc_id = self.conn.execute(
+                "INSERT INTO documents (key, name, indexed_at, source, extraction) VALUES (?, ?, ?, ?, ?)",
+                (key, name, datetime.now().isoformat(), source, stored)
+            ).lastrowid
+
+        units = [("text", f"{number}. {title}", section_text) for number, title, section_text in split_sections(text)]
+        units.extend(extraction_units(extraction or {}))
+
+        unit_rows = {}
+        posting_rows = []
+        for field, section, content in units:
+            # Repeated section numbers are indexed together
+            unit = (field, section)
+            unit_rows[unit] = unit_rows[unit] + "\n" + content if unit in unit_rows else content
+        for (field, section), content in unit_rows.items():
+            positions = {}
+            for position, token in enumerate(tokenize(content)):
+                positions.setdefault(token, array("I")).append(position)
+            for token, token_positions in positions.items():
+                posting_rows.append((self._term_id(token), doc_id, field, section, token_positions.tobytes()))
+
+        self.conn.executemany(
+            "INSERT INTO units (doc_id, field, section, content) VALUES (?, ?, ?, ?)",
+            [(doc_id, field, section, content) for (field, section), content in unit_rows.items()]
+        )
+        self.conn.executemany(
+            "INSERT INTO postings (term_id, doc_id, field, section, positions) VALUES (?, ?, ?, ?, ?)",
+            posting_rows
+        )
+        return doc_id
+
+    def add_document(self, name, text, extraction=None, source=None, key=None):
+        """
+        Indexes (or re-indexes) one processed agreement and its extracted fields under `key`
+        (by default document_key(text)), with `name` as its display name. Returns the key.
+        `source` is "llm" or "regex", depending on how the fields were extracted.
+        """
+        key = key or document_key(text)
+        with self.lock, self.conn:
+            self._add(key, name, text, extraction, source)
+        return key
+
+    def add_documents(self, documents, source=None):
+        """
+        Indexes an iterable of (name, text, extraction) tuples in a single transaction,
+        each under document_key(text).
+        """
+        with self.lock, self.conn:
+            for name, text, extraction in documents:
+                self._add(document_key(text), name, text, extraction, source)
+
+    def _postings(self, term_id, field, doc_ids=None, positions=True):
+        column = "positions" if positions else "length(positions)"
+        query = f"SELECT doc_id, field, section, {column} FROM postings WHERE term_id = ?"
+        params = [term_id]
+        if field:
+            query += " AND field = ?"
+            params.append(field)
+        if doc_ids is None:
+            return self.conn.execute(query, params).fetchall()
+        rows = []
+        doc_ids = sorted(doc_ids)
+        for start in range(0, len(doc_ids), 900):
+            chunk = doc_ids[start:start + 900]
+            rows.extend(self.conn.execute(
+                query + f" AND doc_id IN ({','.join('?' * len(chunk))})", params + chunk
+            ).fetchall())
+        return rows
+
+    def _frequency(self, term_id, frequencies):
+        if term_id not in frequencies:
+            frequencies[term_id] = self.conn.execute(
+                "SELECT COUNT(*) FROM postings WHERE term_id = ?", (term_id,)
+            ).fetchone()[0]
+        return frequencies[term_id]
+
+    def _match_part(self, field, words, candidates, frequencies):
+        """
+        Returns {doc_id: {(field, section): hit_count}} for one term or phrase.
+        """
+        term_ids = [self._lookup_term(word) for word in words]
+        if None in term_ids:
+            return {}
+
+        if len(term_ids) == 1:
+            # Single terms only need the number of positions, not the positions themselves
+            narrow = None
+            if candidates is not None and len(candidates) * NARROW_LOOKUP_RATIO < self._frequency(term_ids[0], frequencies):
+                narrow = candidates
+            matches = {}
+            for doc_id, row_field, section, size in self._postings(term_ids[0], field, narrow, positions=False):
+                if candidates is None or doc_id in candidates:
+                    matches.setdefault(doc_id, {})[(row_field, section)] = size // POSITION_SIZE
+            return matches
+
+        # Intersect the rarest words of a phrase first; offsets keep track of word order
+        ordered = sorted(enumerate(term_ids), key=lambda item: self._frequency(item[1], frequencies))
+        unit_positions = None
+        for offset, term_id in ordered:
+            # Seeking a few candidate documents is cheaper than reading a long posting list
+            narrow = None
+            if candidates is not None and len(candidates) * NARROW_LOOKUP_RATIO < self._frequency(term_id, frequencies):
+                narrow = candidates
+            current = {}
+            for doc_id, row_field, section, blob in self._postings(term_id, field, narrow):
+                if candidates is not None and doc_id not in candidates:
+                    continue
+                key = (doc_id, row_field, section)
+                if unit_positions is not None and key not in unit_positions:
+                    continue
+                positions = array("I")
+                positions.frombytes(blob)
+                # Shift positions so that consecutive phrase words line up on the phrase start
+                starts = {p - offset for p in positions}
+                if unit_positions is not None:
+                    starts &= unit_positions[key]
+                    if not starts:
+                        continue
+                current[key] = starts
+            unit_positions = current
+            if not unit_positions:
+                return {}
+            candidates = {doc_id for doc_id, _, _ in unit_positions}
+
+        matches = {}
+        for (doc_id, row_field, section), starts in unit_positions.items():
+            matches.setdefault(doc_id, {})[(row_field, section)] = len(starts)
+        return matches
+
+    def search(self, query, limit=20):
+        """
+        Finds the documents matching every term and phrase of the query.
+        Returns a list of dicts with the document key and name, a score (number of hits) and the
+        matching (field, section) units, best matches first. Only the `limit` best documents
+        (all of them if None) are read in full.
+        """
+        with self.lock:
+            return self._search(query, limit)
+
+    def _score_bounds(self, parts, limit, frequencies):
+        """
+        Returns [(doc_id, bound)] for the documents that may match every part of the query,
+        highest first. The bound is summed by SQLite from the stored position counts of the
+        rarest word of each part, without reading any positions: for a term it is the exact
+        number of hits in the document, for a phrase an upper bound.
+        """
+        rarest = []
+        for field, words in parts:
+            term_ids = [self._lookup_term(word) for word in words]
+            if None in term_ids:
+                return []
+            rarest.append((min(term_ids, key=lambda term_id: self._frequency(term_id, frequencies)), field))
+
+        # Walk the per-document counts of the rarest part and seek the counts of the others
+        rarest.sort(key=lambda item: self._frequency(item[0], frequencies))
+        (term_id, field), others = rarest[0], rarest[1:]
+        params = []
+        counts = ["d.hits"]
+        for other_id, other_field in others:
+            counts.append("(SELECT SUM(length(positions)) FROM postings WHERE term_id = ? AND doc_id = d.doc_id"
+                          + (" AND field = ?)" if other_field else ")"))
+            params.extend([other_id, other_field] if other_field else [other_id])
+        params.extend([term_id, field] if field else [term_id])
+        params.append(-1 if limit is None else limit)
+
+        # A missing part makes the sum NULL, which drops the document
+        return self.conn.execute(f"""
+            SELECT doc_id, bound / {POSITION_SIZE} FROM (
+                SELECT d.doc_id, {' + '.join(counts)} AS bound
+                FROM (
+                    SELECT doc_id, SUM(length(positions)) AS hits FROM postings
+                    WHERE term_id = ?{' AND field = ?' if field else ''} GROUP BY doc_id
+                ) d
+            )
+            WHERE bound IS NOT NULL ORDER BY bound DESC, doc_id LIMIT ?
+        """, params).fetchall()
+
+    def _match_parts(self, parts, candidates, frequencies):
+        """
+        Returns {doc_id: {(field, section): hit_count}} for the candidate documents that match
+        every part of the query, looking up the rarest part first.
+        """
+        hits = {}
+        for field, words in sorted(parts, key=lambda part: self._part_frequency(part, frequencies)):
+            matches = self._match_part(field, words, candidates, frequencies)
+            candidates = set(matches)
+            if not candidates:
+                return {}
+            for doc_id in candidates:
+                doc_hits = hits.setdefault(doc_id, {})
+                for unit, count in matches[doc_id].items():
+                    doc_hits[unit] = doc_hits.get(unit, 0) + count
+        return {doc_id: units for doc_id, units in hits.items() if doc_id in candidates}
+
+    def _part_frequency(self, part, frequencies):
+        term_ids = [self._lookup_term(word) for word in part[1]]
+        if None in term_ids:
+            return 0
+        return min(self._frequency(term_id, frequencies) for term_id in term_ids)
+
+    def _search(self, query, limit):
+        parts = parse_query(query)
+        if not parts or limit == 0:
+            return []
+
+        # Term hits are counted exactly by SQLite, so only phrases need their positions checked
+        has_phrase = any(len(words) > 1 for _, words in parts)
+        frequencies = {}
+        bounds = self._score_bounds(parts, None if has_phrase else limit, frequencies)
+
+        # Read the matching units of the best documents in batches, stopping as soon as no
+        # remaining document can score higher than the current results
+        ranked = []
+        batch_size = max(limit or len(bounds), 1) * 2
+        for start in range(0, len(bounds), batch_size):
+            if limit is not None and len(ranked) >= limit and ranked[limit - 1][0] >= bounds[start][1]:
+                break
+            batch = [doc_id for doc_id, _ in bounds[start:start + batch_size]]
+            hits = self._match_parts(parts, set(batch), frequencies)
+            ranked.extend((sum(hits[doc_id].values()), doc_id, hits[doc_id]) for doc_id in batch if doc_id in hits)
+            ranked.sort(key=lambda item: -item[0])
+            ranked = ranked[:limit]
+        if not ranked:
+            return []
+
+        documents = {}
+        doc_ids = [doc_id for _, doc_id, _ in ranked]
+        for start in range(0, len(doc_ids), 900):
+            chunk = doc_ids[start:start + 900]
+            for doc_id, key, name in self.conn.execute(
+                f"SELECT doc_id, key, name FROM documents WHERE doc_id IN ({','.join('?' * len(chunk))})", chunk
+            ):
+                documents[doc_id] = (key, name)
+        return [
+            {
+                "key": documents[doc_id][0],
+                "document": documents[doc_id][1],
+                "score": score,
+                "matches": sorted(units, key=units.get, reverse=True)
+            }
+            for score, doc_id, units in ranked
+        ]
+
+    def iter_documents(self):
+        """
+        Yields (key, name, units) for every indexed document, where units maps each field to
+        {section: content} in section order.
+        """
+        with self.lock:
+            documents = self.conn.execute("SELECT doc_id, key, name FROM documents ORDER BY doc_id").fetchall()
+        for doc_id, key, name in documents:
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT field, section, content FROM units WHERE doc_id = ?", (doc_id,)
+                ).fetchall()
+            units = {}
+            for field, section, content in rows:
+                units.setdefault(field, {})[section] = content
+            # Sections are stored as "1. Title"; order them by number with the preamble first
+            for field, sections in units.items():
+                units[field] = dict(sorted(sections.items(), key=lambda item: section_sort_key(item[0])))
+            yield key, name, units
+
+    def iter_extractions(self, source=None):
+        """
+        Yields (key, name, text, extraction) for every indexed document with a stored extraction,
+        optionally only those extracted by `source`. The text is rebuilt from its sections.
+        """
+        query = "SELECT doc_id, key, name, extraction FROM documents WHERE extraction IS NOT NULL"
+        params = []
+        if source:
+            query += " AND source = ?"
+            params.append(source)
+        with self.lock:
+            documents = self.conn.execute(query + " ORDER BY doc_id", params).fetchall()
+        for doc_id, key, name, extraction in documents:
+            with self.lock:
+                sections = self.conn.execute(
+                    "SELECT section, content FROM units WHERE doc_id = ? AND field = 'text'", (doc_id,)
+                ).fetchall()
+            sections.sort(key=lambda row: section_sort_key(row[0]))
+            yield key, name, "\n".join(content for _, content in sections), json.loads(extraction)
+
+    def get_unit(self, key, field, section):
+        """
+        Returns the stored text of one field/section of an indexed document, given its key.
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT content FROM units JOIN documents USING (doc_id) WHERE key = ? AND field = ? AND section = ?",
+                (key, field, section)
+            ).fetchone()
+        return row[0] if row else None
+
+def main():
+    """
+    Command-line search over the index.
+    """
+    parser = argparse.ArgumentParser(description="Search processed agreements.")
+    parser.add_argument("query", help='Search query, e.g. \'"payment due within 90 days"\' or \'risky_clauses:indemnification\'.')
+    parser.add_argument("--index", default=SEARCH_INDEX_FILE, help="Path to the search index.")
+    parser.add_argument("--limit", type=int, default=20, help="Maximum number of results.")
+    args = parser.parse_args()
+
+    index = SearchIndex(args.index)
+    for result in index.search(args.query, limit=args.limit):
+        units = ", ".join(f"{field} [{section}]" if section else field for field, section in result["matches"])
+        print(f"{result['document']} (score {result['score']}): {units}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import pytest
+
+from search_index import SearchIndex
+from clause_classifier import ClauseClassifier, examples_from_search_index
+
+np = pytest.importorskip("numpy")
+
+def make_document(i, risky):
+    text = (f"This Agreement is made between Acme {i} Inc and Beta {i} LLC.\n"
+            f"1. Services. Provider shall deliver the reports every month to the Client.\n"
+            f"2. Indemnification. Provider shall indemnify and hold harmless Client from any and all claims.\n"
+            f"3. Renewal. This Agreement shall automatically renew for successive one year terms.\n"
+            f"4. Payment. Payment is due within {30 + i} days of invoice.")
+    extraction = {"parties": [f"Acme {i} Inc", f"Beta {i} LLC"], "risky_clauses": [
+        {"clause_text": "Provider shall indemnify and hold harmless Client from any and all claims.",
+         "explanation": "Broad indemnity."},
+        {"clause_text": "This Agreement shall automatically renew for successive one year terms.",
+         "explanation": "Renews without notice."},
+    ] if risky else ["indemnify", "renew"]}
+    return f"agreement_{i}.txt", text, extraction
+
+def test_train_from_search_index(tmp_path):
+    index = SearchIndex(str(tmp_path / "search.db"))
+    index.add_documents([make_document(i, True) for i in range(10)], source="llm")
+    # Regex results only hold keywords and would add unlabelled indemnity sections
+    index.add_documents([make_document(i, False) for i in range(10, 30)], source="regex")
+
+    texts, labels = examples_from_search_index(index)
+    assert len(texts) == 50
+    assert labels[:5] == [[], [], ["indemnification"], ["auto_renewal"], []]
+
+    classifier = ClauseClassifier().fit(texts, labels)
+    triage = classifier.triage(make_document(99, True)[1])
+    assert [section["section"] for section in triage["flagged_sections"]] == ["2. Indemnification", "3. Renewal"]
@@ -0,0 +1,43 @@
+from entity_index import EntityIndex, display_name, normalize_party
+
+def test_role_labels_are_removed():
+    assert display_name('Acme Holdings Ltd. (herein "Buyer")') == "Acme Holdings Ltd."
+    assert display_name('Beta LLC (hereinafter referred to as the "Client")') == "Beta LLC"
+    assert display_name('Gamma Corp, hereinafter "Vendor"') == "Gamma Corp"
+    assert display_name("Omega Systems (UK) Ltd") == "Omega Systems (UK) Ltd"
+    assert normalize_party('Acme, Inc. ("Provider")') == "acme"
+
+def test_prefix_is_normalized_like_names(tmp_path):
+    index = EntityIndex(str(tmp_path / "entities.db"))
+    index.add_document("a.txt", {"parties": ["Acme, Inc.", 'Acme Holdings Ltd. (herein "Buyer")'], "vendor": "Beta LLC"})
+    assert index.prefix_lookup("acme inc") == ["Acme, Inc.", "Acme Holdings Ltd."]
+    assert index.prefix_lookup("The ACME Hold") == ["Acme Holdings Ltd."]
+    assert index.prefix_lookup("beta l.l.c.") == ["Beta LLC"]
+    assert index.prefix_lookup("...") == []
+
+def test_documents_with_the_same_name_are_kept_apart(tmp_path):
+    index = EntityIndex(str(tmp_path / "entities.db"))
+    index.add_document("contract.pdf", {"parties": ["Acme Inc.", "Beta LLC"]}, key="a")
+    index.add_document("contract.pdf", {"parties": ["Acme Inc.", "Gamma Ltd"]}, key="b")
+    assert index.documents_for("acme") == ["contract.pdf", "contract.pdf"]
+    index.add_document("contract.pdf", {"parties": ["Gamma Ltd"]}, key="b")
+    assert index.documents_for("acme") == ["contract.pdf"]
+    assert index.documents_for("gamma") == ["contract.pdf"]
+
+def test_import_search_index_uses_the_stored_extractions(tmp_path):
+    from search_index import SearchIndex
+    search_index = SearchIndex(str(tmp_path / "search.db"))
+    extraction = {"parties": ['Acme Holdings Ltd. (herein "Buyer")', "Beta LLC"], "vendor": "Beta LLC"}
+    key = search_index.add_document("a.txt", "This Agreement is made between Acme and Beta.", extraction)
+    index = EntityIndex(str(tmp_path / "entities.db"))
+    assert index.import_search_index(search_index) == 1
+    assert index.documents_for("beta", role="vendor") == ["a.txt"]
+    assert index.conn.execute("SELECT key FROM documents").fetchall() == [(key,)]
+
+def test_fuzzy_lookup_finds_a_typo_among_common_words(tmp_path):
+    index = EntityIndex(str(tmp_path / "entities.db"))
+    names = [f"{word} Systems Holdings {number}" for word in ("Acme", "Beta", "Gamma") for number in range(300)]
+    index.add_documents([(f"{i}.txt", {"parties": [name]}) for i, name in enumerate(names)] +
+                        [("x.txt", {"parties": ["Zyxtrel Systems Holdings"]})])
+    assert index.fuzzy_lookup("Zyxtrl Systems Holdings", limit=1) == [("Zyxtrel Systems Holdings", 0.815)]
+    assert index.fuzzy_lookup("Qwvjk Pmfz") == []
@@ -0,0 +1,26 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from job_queue import AnalysisQueue
+
+def test_shutdown_leaves_a_shared_executor_to_other_queues():
+    release = threading.Event()
+
+    def analyze(file_path):
+        release.wait(5)
+        return file_path, None
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    first, second = AnalysisQueue(analyze, executor=executor), AnalysisQueue(analyze, executor=executor)
+    running = first.submit("a.txt", "a.txt", "alice")
+    queued = first.submit("b.txt", "b.txt", "alice")
+    other = second.submit("c.txt", "c.txt", "bob")
+    first.shutdown()
+    assert (queued.status, queued.error) == ("failed", "Cancelled")
+
+    release.set()
+    other.future.result(5)
+    running.future.result(5)
+    assert (running.status, running.username) == ("done", "alice")
+    assert (other.status, other.username) == ("done", "bob")
+    executor.shutdown()
@@ -0,0 +1,52 @@
+import json
+
+from json_stream import IncrementalJSONParser
+
+RESPONSE = '''```json
+{
+  "parties": ["Acme Inc", "Beta LLC"],
+  "effective_date": "2024-01-15",
+  "amount": 12.5,
+  "limit": 1e3,
+  "active": true,
+  "termination_clause": null,
+  "risky_clauses": [
+    {"clause_text": "Provider shall indemnify Client.", "explanation": "Broad indemnity."},
+    {"clause_text": "Liability is unlimited.", "explanation": "No cap, \\"as is\\"."}
+  ],
+  "vendor": "Acme Inc"
+}
+```'''
+
+def feed_in_chunks(text, size):
+    parser = IncrementalJSONParser(item_fields=("risky_clauses", "parties"))
+    events = []
+    for start in range(0, len(text), size):
+        events.extend(parser.feed(text[start:start + size]))
+    return parser, events
+
+def test_every_chunk_size_gives_the_full_parse():
+    expected = json.loads(RESPONSE.strip("`json\n"))
+    for size in range(1, 40):
+        parser, events = feed_in_chunks(RESPONSE, size)
+        assert parser.done, size
+        assert parser.fields == expected, size
+        assert [e[1] for e in events if e[0] == "field"] == list(expected), size
+        assert [e[2] for e in events if e[0] == "item" and e[1] == "risky_clauses"] == expected["risky_clauses"], size
+
+def test_numbers_split_across_chunks_are_not_emitted_early():
+    parser, events = feed_in_chunks('{"a": 12.5, "b": 1e3, "c": -7}', 1)
+    assert events == [("field", "a", 12.5), ("field", "b", 1000.0), ("field", "c", -7)]
+    assert parser.done
+
+def test_number_at_chunk_boundary():
+    parser = IncrementalJSONParser()
+    assert parser.feed('{"a": 12') == []
+    assert parser.feed('.5, "b": tr') == [("field", "a", 12.5)]
+    assert parser.feed('ue}') == [("field", "b", True)]
+    assert parser.done
+
+def test_incomplete_response_is_not_done():
+    parser, events = feed_in_chunks('{"a": "x", "b": [1, 2', 3)
+    assert events == [("field", "a", "x")]
+    assert not parser.done
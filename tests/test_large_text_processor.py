@@ -0,0 +1,26 @@
+from processors.large_text_processor import process_large_text_file
+from processors.text_processor import process_text
+from utils import document_key, file_document_key
+
+def agreement(clause_words):
+    payment = " ".join(f"installment{i}" for i in range(clause_words))
+    return ("This Agreement is made between Acme Inc and Beta LLC. This Agreement is effective as of March 1, 2024.\n"
+            + "Filler text without any headings. " * 100
+            + f"\n1. Payment Terms. {payment} paid in full.\n2. Termination. Either party may terminate upon notice.\n"
+            + "3. Confidentiality. Both parties keep all information confidential.")
+
+def test_long_clauses_are_not_truncated(tmp_path):
+    for clause_words in (10, 500, 3000):
+        text = agreement(clause_words)
+        path = tmp_path / "agreement.txt"
+        path.write_text(text)
+        result = process_large_text_file(str(path), chunk_size=1000, overlap=200)
+        assert result.to_dict() == process_text(text).to_dict()
+        assert result.payment_terms.endswith("paid in full.")
+
+def test_file_document_key_matches_the_text_key(tmp_path):
+    path = tmp_path / "agreement.txt"
+    path.write_text(agreement(3000))
+    with open(path, 'r') as f:
+        text = f.read()
+    assert file_document_key(str(path), chunk_size=1000) == document_key(text)
@@ -0,0 +1,19 @@
+import pytest
+
+from llm_backend import LLMBackend, FakeBackend
+
+def test_incomplete_backend_cannot_be_created():
+    class Incomplete(LLMBackend):
+        def generate(self, prompt):
+            return "", {}
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+def test_fake_backend_implements_the_interface():
+    backend = FakeBackend(seed=0)
+    text, usage = backend.generate("Agreement text: This Agreement is made between Acme Inc and Beta LLC.")
+    assert usage["total_tokens"] == usage["input_tokens"] + usage["output_tokens"]
+    stream = backend.generate_stream("Agreement text: Payment is due within 30 days.")
+    assert "".join(stream).startswith("```json")
+    assert stream.token_usage["input_tokens"] == backend.count_tokens("Agreement text: Payment is due within 30 days.")
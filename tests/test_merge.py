@@ -0,0 +1,81 @@
+import random
+
+from processors.text_processor import process_text
+from near_duplicate import NearDuplicateIndex, extract_with_reuse
+from version_diff import reanalyze_changed_sections
+
+WORDS = "alpha beta gamma delta epsilon zeta theta kappa lambda sigma omega river stone cloud field".split()
+rng = random.Random(3)
+BODY = "\n".join(f"{i}. Clause {i}. " + " ".join(rng.choices(WORDS, k=80)) + "." for i in range(5, 12))
+CONFIDENTIALITY = "3. Confidentiality. Both parties agree to keep confidential all information disclosed during the term of this Agreement."
+OLD = f"""This Agreement is made between Globex LLC and Initech Corp. This Agreement is effective as of January 1, 2024.
+1. Payment Terms. Payment is due within 30 days of invoice.
+2. Termination. Either party may terminate upon 30 days notice.
+{CONFIDENTIALITY}
+4. Liability. Provider shall indemnify Client against all claims.
+{BODY}"""
+# The parties swap places and the confidentiality section is replaced
+NEW = OLD.replace(CONFIDENTIALITY, "3. Notices. Notices must be sent in writing to the addresses above.").replace(
+    "between Globex LLC and Initech Corp", "between Initech Corp and Globex LLC")
+
+def regex_extractor(text):
+    return process_text(text).to_dict()
+
+def guessing_extractor(text):
+    # Like the LLM given only part of a document: guesses a vendor and flags a clause that is not there
+    extraction = regex_extractor(text)
+    extraction["vendor"] = "Wrong Guess Inc"
+    extraction["risky_clauses"] = (extraction["risky_clauses"] or []) + [
+        {"clause_text": "Effective date not specified", "explanation": "Missing date."}]
+    return extraction
+
+def old_extraction():
+    extraction = regex_extractor(OLD)
+    extraction["vendor"] = "Globex LLC"
+    return extraction
+
+def check(merged, full):
+    assert merged["confidentiality_obligations"] is None
+    assert merged["parties"] == full["parties"]
+    assert merged["risky_clauses"] == full["risky_clauses"]
+    assert merged["payment_terms"] == full["payment_terms"]
+    assert merged["vendor"] == "Globex LLC"
+
+def test_reanalyze_changed_sections():
+    full = regex_extractor(NEW)
+    for extractor in (regex_extractor, guessing_extractor):
+        merged, report = reanalyze_changed_sections(OLD, old_extraction(), NEW, extractor)
+        check(merged, full)
+
+def test_extract_with_reuse(tmp_path):
+    full = regex_extractor(NEW)
+    for extractor in (regex_extractor, guessing_extractor):
+        index = NearDuplicateIndex(str(tmp_path / f"{extractor.__name__}.db"))
+        index.add("old.txt", OLD, old_extraction())
+        merged, report = extract_with_reuse(NEW, "new.txt", extractor, index, threshold=0.5)
+        assert report["reused_from"] == "old.txt"
+        assert report["removed_sections"] == ["3. Confidentiality"]
+        check(merged, full)
+
+def test_near_duplicate_index_replaces_documents(tmp_path):
+    path = str(tmp_path / "near_duplicates.db")
+    index = NearDuplicateIndex(path)
+    key = index.add("contract.txt", OLD, old_extraction())
+    assert index.add("contract.txt", OLD, dict(old_extraction(), vendor="Initech Corp")) == key
+    index.add("contract.txt", NEW, regex_extractor(NEW), key="other")
+    index.close()
+
+    index = NearDuplicateIndex(path)
+    assert index.conn.execute("SELECT count(*) FROM documents").fetchone() == (2,)
+    assert index.get(key)["extraction"]["vendor"] == "Initech Corp"
+    match_key, similarity = index.query(OLD, exclude=key)
+    assert match_key == "other" and similarity > 0.5
+    assert index.query("Nothing like the agreements above.") == (None, 0.0)
+
+def test_reworded_values_are_traced_to_their_sections():
+    extraction = dict(old_extraction(),
+                      confidentiality_obligations="Each party must keep all disclosed information confidential while the agreement is in force.",
+                      risky_clauses=[{"clause_text": "The provider has to indemnify the client for every claim.", "explanation": "Broad."}])
+    merged, report = reanalyze_changed_sections(OLD, extraction, NEW, guessing_extractor)
+    assert merged["confidentiality_obligations"] is None
+    assert merged["risky_clauses"] == extraction["risky_clauses"]
@@ -0,0 +1,58 @@
+from search_index import SearchIndex
+
+DOCUMENTS = [
+    ("a.txt", "1. Payment. Payment due within 30 days.\n2. Liability. Liability is unlimited. Liability survives.",
+     {"risky_clauses": [{"clause_text": "Liability is unlimited.", "explanation": "No cap."}]}),
+    ("b.txt", "1. Payment. Payment due within 90 days.\n2. Liability. Unlimited liability for unlimited claims.", None),
+    # Has every word of the phrase, but never in order
+    ("c.txt", "1. Payment. Days within due payment.\n2. Liability. Liability is capped.", None),
+]
+
+def make_index(tmp_path):
+    index = SearchIndex(str(tmp_path / "search.db"))
+    index.add_documents(DOCUMENTS)
+    return index
+
+def test_terms_are_ranked_by_hits(tmp_path):
+    results = make_index(tmp_path).search("liability unlimited")
+    assert [(r["document"], r["score"]) for r in results] == [("a.txt", 6), ("b.txt", 4)]
+    assert results[0]["matches"][0] == ("text", "2. Liability")
+
+def test_phrases_are_checked_against_positions(tmp_path):
+    index = make_index(tmp_path)
+    assert [r["document"] for r in index.search('"payment due within"')] == ["a.txt", "b.txt"]
+    assert index.search('"due within 90 days" liability')[0]["document"] == "b.txt"
+    assert index.search('"days within" missing') == []
+
+def test_limit_and_fields(tmp_path):
+    index = make_index(tmp_path)
+    assert [r["document"] for r in index.search("liability", limit=1)] == ["a.txt"]
+    assert index.search("liability", limit=0) == []
+    assert len(index.search("payment", limit=None)) == 3
+    results = index.search("risky_clauses:unlimited")
+    assert [(r["document"], r["matches"]) for r in results] == [("a.txt", [("risky_clauses", "1")])]
+
+def test_documents_with_the_same_name_are_kept_apart(tmp_path):
+    index = make_index(tmp_path)
+    first = index.add_document("contract.pdf", "1. Payment. Payment due within 45 days.")
+    second = index.add_document("contract.pdf", "1. Payment. Payment due within 60 days.")
+    assert first != second
+    assert [(r["document"], r["key"]) for r in index.search('"45 days"') + index.search('"60 days"')] == [
+        ("contract.pdf", first), ("contract.pdf", second)]
+    assert index.get_unit(second, "text", "1. Payment") == "1. Payment. Payment due within 60 days."
+
+    # A caller-supplied ID replaces the previous version
+    index.add_document("contract.pdf", "1. Payment. Payment due within 15 days.", key=second)
+    assert index.search('"60 days"') == []
+    assert index.search('"15 days"')[0]["key"] == second
+
+def test_indexes_keyed_by_name_are_migrated(tmp_path):
+    import sqlite3
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE documents (doc_id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL, indexed_at TEXT NOT NULL)")
+    conn.execute("INSERT INTO documents VALUES (1, 'a.txt', '2024-01-01')")
+    conn.commit()
+    conn.close()
+    index = SearchIndex(path)
+    assert index.conn.execute("SELECT key, name, source FROM documents").fetchall() == [("a.txt", "a.txt", None)]
@@ -1,6 +1,7 @@
-import csv
 import json
 
+from extraction_result import write_csv
+
 def transform_data(json_file, output_file):
     """
     Transforms data from a JSON file to a CSV file with three columns:
@@ -17,10 +18,9 @@ def transform_data(json_file, output_file):
         print(f"Error: Invalid JSON format in '{json_file}': {e}")
         return
 
+    # Every key of the file is written, including any outside the extracted fields
     transformed_data = []
-    serial_number = 1  # Start at 1
-
-    for agreement_term, extracted_data in data.items():
+    for serial_number, (agreement_term, extracted_data) in enumerate(data.items(), start=1):
         # If the value is a list → join items with commas
         if isinstance(extracted_data, list):
             extracted_data = ", ".join(str(item) for item in extracted_data)
@@ -29,21 +29,11 @@ def transform_data(json_file, output_file):
         elif isinstance(extracted_data, dict):
             extracted_data = "; ".join(f"{k}: {v}" for k, v in extracted_data.items())
 
-        # Ensure it's a string
-        extracted_data = str(extracted_data)
-
-        transformed_data.append([serial_number, agreement_term, extracted_data])
-        serial_number += 1
+        transformed_data.append([serial_number, agreement_term, str(extracted_data)])
 
     try:
         with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-            csv_writer = csv.writer(csvfile)
-
-            # Correct header
-            csv_writer.writerow(["Serial Number", "POLICY TERMS", "DATA FROM THE AGREEMENT"])
-
-            # Write rows
-            csv_writer.writerows(transformed_data)
+            csvfile.write(write_csv(["Serial Number", "POLICY TERMS", "DATA FROM THE AGREEMENT"], transformed_data))
 
         print(f"✅ Successfully transformed data from '{json_file}' to '{output_file}'")
 
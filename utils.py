@@ -1,4 +1,5 @@
 import re
+import hashlib
 from datetime import datetime
 
 def format_date(date_str):
@@ -15,6 +16,23 @@ def format_date(date_str):
         # Return the original string if parsing fails
         return date_str
 
+def document_key(text):
+    """
+    Returns the key a document is stored under in the indexes: a hash of its text, so that
+    different agreements with the same file name are kept apart.
+    """
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def file_document_key(file_path, chunk_size=1024 * 1024):
+    """
+    Returns document_key of a plain-text file's contents without reading the whole file into memory.
+    """
+    digest = hashlib.sha1()
+    with open(file_path, 'r') as f:
+        for block in iter(lambda: f.read(chunk_size), ""):
+            digest.update(block.encode("utf-8"))
+    return digest.hexdigest()
+
 def extract_clause(text, clause_title):
     """
     Extracts a specific clause from the text based on its title.
@@ -27,3 +45,140 @@ def extract_clause(text, clause_title):
     if match:
         return match.group(2).strip()
     return None
+
+def split_sections(text):
+    """
+    Splits agreement text into numbered sections.
+    Returns a list of (number, title, section_text) tuples; any text before the first
+    numbered heading is returned as the "preamble" section.
+    """
+    sections = []
+    starts = [match.start(1) for match in re.finditer(r"(?:^|\n)(\d+\.\s+)", text)]
+    if not starts or text[:starts[0]].strip():
+        sections.append(("preamble", "Preamble", text[:starts[0]] if starts else text))
+    for i, start in enumerate(starts):
+        end = starts[i + 1] if i + 1 < len(starts) else len(text)
+        section_text = text[start:end]
+        number, _, rest = section_text.partition(".")
+        title = re.split(r"[.\n]", rest.strip(), maxsplit=1)[0].strip()
+        sections.append((number, title, section_text))
+    return sections
+
+def section_keys(sections):
+    """
+    Returns a unique "number. title" key for each (number, title, section_text) section.
+    """
+    keys = []
+    for number, title, _ in sections:
+        key = f"{number}. {title}"
+        # Keep keys unique when a section number is repeated, e.g. in nested lists
+        suffix = 2
+        while key in keys:
+            key = f"{number}. {title} ({suffix})"
+            suffix += 1
+        keys.append(key)
+    return keys
+
+# Share of a value's words that must appear in a section for it to count as the value's source
+SOURCE_COVERAGE = 0.4
+
+def item_text(item):
+    return (item.get("clause_text") or "") if isinstance(item, dict) else str(item)
+
+def word_stems(text):
+    """
+    Returns the set of word stems (first five letters) of a text, ignoring words of three
+    letters or less unless there are no others, so that reworded values can still be matched.
+    """
+    words = re.findall(r"\w+", text.lower())
+    stems = {word[:5] for word in words if len(word) > 3}
+    return stems or set(words)
+
+def value_coverage(value, text_stems):
+    """
+    Returns the share of the value's word stems found in a text (given as its word_stems).
+    """
+    stems = word_stems(value)
+    return len(stems & text_stems) / len(stems) if stems else 0.0
+
+def value_sources(value, section_stems):
+    """
+    Returns the keys of the sections a value was most likely extracted from, or [] if it cannot
+    be traced. A value combined from several sections is traced to each of them.
+    """
+    coverage = {key: value_coverage(value, stems) for key, stems in section_stems.items()}
+    best = max(coverage.values(), default=0.0)
+    if best < SOURCE_COVERAGE:
+        return []
+    return [key for key, share in coverage.items() if share >= best * 0.75]
+
+def extraction_sources(extraction, text):
+    """
+    Maps each extracted field to the keys (see section_keys) of the sections its value came from;
+    list fields map to one list of keys per item.
+    """
+    sections = split_sections(text)
+    section_stems = {
+        key: word_stems(section_text) for key, (_, _, section_text) in zip(section_keys(sections), sections)
+    }
+    sources = {}
+    for key, value in extraction.items():
+        if isinstance(value, list):
+            sources[key] = [value_sources(item_text(item), section_stems) for item in value]
+        elif value:
+            sources[key] = value_sources(str(value), section_stems)
+    return sources
+
+def merge_extraction(previous, previous_sources, partial, changed_text, new_text, stale_sections):
+    """
+    Merges an extraction made from only the changed sections of a document into the extraction
+    of its previous version.
+
+    `previous_sources` is extraction_sources() of the previous version, `stale_sections` the keys
+    of its sections that were modified or removed, and `changed_text` the text the partial
+    extraction was made from. A previous value is replaced only when its source sections changed,
+    and dropped when they are all gone and the changed text no longer contains it. Partial values
+    are taken only when they can be traced to the changed text, so that fields guessed from an
+    incomplete document (e.g. by the LLM) do not overwrite correct ones. List items are ordered
+    by their position in the new text.
+    """
+    previous_sources = previous_sources or {}
+    stale_sections = set(stale_sections)
+    changed_stems = word_stems(changed_text)
+    traced = lambda value: value_coverage(value, changed_stems) >= SOURCE_COVERAGE
+
+    merged = {}
+    for key in list(previous) + [k for k in partial if k not in previous]:
+        old_value = previous.get(key)
+        new_value = partial.get(key)
+        sources = previous_sources.get(key)
+        if isinstance(old_value, list) or isinstance(new_value, list):
+            item_sources = sources if isinstance(sources, list) and len(sources) == len(old_value or []) else []
+            items = []
+            for i, item in enumerate(old_value or []):
+                item_keys = item_sources[i] if item_sources else []
+                if not item_keys or not set(item_keys) <= stale_sections or traced(item_text(item)):
+                    items.append(item)
+            seen = {" ".join(item_text(item).lower().split()) for item in items}
+            for item in new_value or []:
+                normalized = " ".join(item_text(item).lower().split())
+                if normalized not in seen and traced(item_text(item)):
+                    items.append(item)
+                    seen.add(normalized)
+            positions = [new_text.find(item_text(item)) for item in items]
+            order = sorted(range(len(items)), key=lambda i: (positions[i] if positions[i] >= 0 else len(new_text), i))
+            items = [items[i] for i in order]
+            merged[key] = items if items or isinstance(old_value, list) else None
+        else:
+            new_value = new_value if new_value and traced(str(new_value)) else None
+            if sources and set(sources) <= stale_sections:
+                # Every section the value came from was modified or removed; keep the value
+                # only if the changed sections still contain it
+                merged[key] = new_value or (old_value if traced(str(old_value)) else None)
+            elif sources and set(sources) & stale_sections:
+                merged[key] = new_value or old_value
+            elif sources:
+                merged[key] = old_value
+            else:
+                merged[key] = new_value or old_value
+    return merged
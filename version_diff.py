@@ -0,0 +1,116 @@
+import re
+import difflib
+
+from utils import split_sections, section_keys, extraction_sources, merge_extraction
+
+def normalize_section(section_text):
+    """
+    Returns the section body without its number, with whitespace collapsed, so that
+    renumbered or reformatted sections compare as equal.
+    """
+    body = re.sub(r"^\s*\d+\.\s*", "", section_text)
+    return " ".join(body.split())
+
+def align_sections(old_text, new_text):
+    """
+    Aligns the numbered sections of two versions of an agreement.
+    Sections are matched by title first, so inserted or removed sections do not shift
+    the whole document, and then by section number.
+    Returns a list of (old_section, new_section) pairs; either side is None for removed or added sections.
+    """
+    old_sections = split_sections(old_text)
+    new_sections = split_sections(new_text)
+    unmatched = list(range(len(old_sections)))
+    matches = {}
+
+    for key_index in (1, 0):  # title, then number
+        for new_index, new_section in enumerate(new_sections):
+            if new_index in matches:
+                continue
+            key = new_section[key_index].lower()
+            for old_index in unmatched:
+                if old_sections[old_index][key_index].lower() == key:
+                    matches[new_index] = old_index
+                    unmatched.remove(old_index)
+                    break
+
+    pairs = []
+    for new_index, new_section in enumerate(new_sections):
+        old_index = matches.get(new_index)
+        pairs.append((old_sections[old_index] if old_index is not None else None, new_section))
+    for old_index in unmatched:
+        pairs.append((old_sections[old_index], None))
+    return pairs
+
+def diff_sections(old_text, new_text):
+    """
+    Computes a section-level diff between two versions of an agreement.
+    Returns a list of dicts with the old and new section labels, the status
+    ("unchanged", "modified", "added" or "removed") and, for modified sections, a similarity ratio.
+    """
+    changes = []
+    for old_section, new_section in align_sections(old_text, new_text):
+        change = {
+            "old_section": f"{old_section[0]}. {old_section[1]}" if old_section else None,
+            "new_section": f"{new_section[0]}. {new_section[1]}" if new_section else None,
+        }
+        if old_section is None:
+            change["status"] = "added"
+        elif new_section is None:
+            change["status"] = "removed"
+        else:
+            old_body = normalize_section(old_section[2])
+            new_body = normalize_section(new_section[2])
+            if old_body == new_body:
+                change["status"] = "unchanged"
+            else:
+                change["status"] = "modified"
+                change["similarity"] = round(difflib.SequenceMatcher(None, old_body, new_body).ratio(), 3)
+        change["text"] = new_section[2] if new_section else None
+        change["old_text"] = old_section[2] if old_section else None
+        changes.append(change)
+    return changes
+
+def reanalyze_changed_sections(old_text, old_extraction, new_text, extractor):
+    """
+    Re-runs extraction only on the sections that were added or modified in the new version
+    and merges the result into the extraction of the old version.
+
+    Values of the old extraction are traced back to the sections they came from; values whose
+    sections were modified or removed are replaced by the re-extracted ones or dropped, and
+    the rest are kept (see utils.merge_extraction).
+
+    `extractor` is a function from text to a dict of extracted fields (regex or LLM based).
+    Returns (merged_extraction, change_report).
+    """
+    changes = diff_sections(old_text, new_text)
+    changed_text = "\n".join(change["text"] for change in changes if change["status"] in ("added", "modified"))
+
+    old_sections = split_sections(old_text)
+    old_keys = {}
+    for key, (_, _, section_text) in zip(section_keys(old_sections), old_sections):
+        old_keys.setdefault(section_text, []).append(key)
+    stale = [
+        key for change in changes if change["status"] in ("modified", "removed")
+        for key in old_keys.get(change["old_text"], [])
+    ]
+
+    partial = extractor(changed_text) if changed_text else {}
+    merged = merge_extraction(
+        old_extraction, extraction_sources(old_extraction, old_text), partial, changed_text, new_text, stale
+    )
+
+    field_changes = []
+    for key in merged:
+        if merged[key] != old_extraction.get(key):
+            field_changes.append({"field": key, "old": old_extraction.get(key), "new": merged[key]})
+
+    report = {
+        "sections": [
+            {key: value for key, value in change.items() if key not in ("text", "old_text")}
+            for change in changes if change["status"] != "unchanged"
+        ],
+        "unchanged_sections": sum(1 for change in changes if change["status"] == "unchanged"),
+        "fields": field_changes
+    }
+    return merged, report